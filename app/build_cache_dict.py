@@ -0,0 +1,43 @@
+"""
+Build the zstd dictionary for cache values
+Trains a dictionary from the values currently cached in Redis and writes it for CACHE_ZSTD_DICT_PATH:
+
+    python -m app.build_cache_dict cache.zdict
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+from app.services.cache_service import cache_service
+
+
+async def build(path: str, max_samples: int, dict_size: int) -> int:
+    """
+    Train and write the dictionary, closing the cache connections afterwards.
+    """
+    try:
+        return await cache_service.build_compression_dictionary(path, max_samples, dict_size)
+    finally:
+        await cache_service.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Train a zstd dictionary for CACHE_ZSTD_DICT_PATH from cached values in Redis")
+    parser.add_argument("path", help="file to write the dictionary to")
+    parser.add_argument("--max-samples", type=int, default=2000, help="cached values to train on")
+    parser.add_argument("--dict-size", type=int, default=16384, help="dictionary size in bytes")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    
+    try:
+        samples = asyncio.run(build(args.path, args.max_samples, args.dict_size))
+    except Exception as e:
+        print(f"Failed to build dictionary: {e}", file=sys.stderr)
+        return 1
+    print(f"Wrote {args.path} from {samples} cached values. Set CACHE_ZSTD_DICT_PATH={args.path} on every worker.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
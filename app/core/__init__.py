@@ -5,14 +5,48 @@ Contains shared configuration and utilities
 from app.core.config import *
 
 __all__ = [
+    "Settings",
+    "get_settings",
+    "settings",
     "DATABASE_URL",
+    "DB_POOL_SIZE",
+    "DB_MAX_OVERFLOW",
+    "DB_POOL_TIMEOUT",
+    "DB_POOL_RECYCLE",
+    "DB_USE_PGBOUNCER",
+    "LOG_BATCH_SIZE",
+    "LOG_FLUSH_INTERVAL_MS",
+    "LOG_QUEUE_MAX_SIZE",
+    "LOG_HIT_OUTPUTS",
+    "CACHE_ZSTD_DICT_PATH",
+    "SEMANTIC_CACHE_ENABLED",
+    "SEMANTIC_CACHE_THRESHOLD",
+    "SEMANTIC_CACHE_SIZE",
+    "L0_CACHE_MAXSIZE",
+    "L0_CACHE_TTL",
+    "CACHE_BLOOM_ENABLED",
+    "CACHE_BLOOM_CAPACITY",
+    "CACHE_BLOOM_ERROR_RATE",
+    "CACHE_BLOOM_SYNC_INTERVAL",
+    "CACHE_CIRCUIT_COOLDOWN",
+    "CACHE_LOCK_TTL",
+    "CACHE_STATS_LOG_INTERVAL",
     "REDIS_URL",
     "REDIS_TTL",
+    "REDIS_MAX_CONNECTIONS",
+    "REDIS_STALE_TTL",
+    "STATS_CACHE_TTL",
     "MEMCACHE_HOST",
     "MEMCACHE_PORT",
     "MEMCACHE_TTL",
+    "MEMCACHE_POOL_SIZE",
     "GROQ_API_KEY",
     "GROQ_MODEL",
+    "IMAGE_CONCURRENCY",
+    "MAX_IMAGE_BYTES",
+    "ALLOWED_ORIGINS",
     "APP_NAME",
-    "DEBUG"
+    "DEBUG",
+    "LOG_LEVEL",
+    "THREADPOOL_SIZE"
 ]
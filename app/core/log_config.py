@@ -0,0 +1,59 @@
+"""
+Logging Configuration
+Moves log I/O off the request path: records are queued and written in batches by a background thread
+"""
+import logging
+import logging.handlers
+import queue
+import sys
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Bytes buffered before a write is forced, even while more records are queued
+LOG_BUFFER_SIZE = 64 * 1024
+
+
+class _BatchingStreamHandler(logging.StreamHandler):
+    """
+    Stream handler that only flushes once the log queue is drained (or the buffer is full),
+    so a burst of records costs one write() instead of one per record.
+    """
+
+    def __init__(self, stream, log_queue: queue.Queue):
+        super().__init__(stream)
+        self._queue = log_queue
+        self._pending = 0
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            msg = self.format(record) + self.terminator
+            self.stream.write(msg)
+            self._pending += len(msg)
+            if self._pending >= LOG_BUFFER_SIZE or self._queue.empty():
+                self.flush()
+                self._pending = 0
+        except Exception:
+            self.handleError(record)
+
+
+def setup_logging(level) -> logging.handlers.QueueListener:
+    """
+    Route root logging through a queue to a batching stderr writer and start the writer thread.
+    Call stop() on the returned listener at shutdown to flush what is left.
+    """
+    log_queue: queue.Queue = queue.Queue(-1)
+
+    # Block-buffered view of stderr; the handler decides when to flush
+    stream = open(sys.stderr.fileno(), "w", buffering=LOG_BUFFER_SIZE, closefd=False)
+    handler = _BatchingStreamHandler(stream, log_queue)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    return listener
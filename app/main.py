@@ -1,7 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from starlette.types import Receive, Scope, Send
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+import anyio.to_thread
+import asyncio
+import gc
 import logging
+import orjson
 from app.routers import (
     health_router,
     statistics_router,
@@ -9,18 +17,22 @@ from app.routers import (
     image_router,
     predict_router
 )
+from app.routers.health import refresh_health_loop
+from app.services.ai_service import ai_service
 from app.services.db_service import db_service
-from app.core.config import APP_NAME, DEBUG
+from app.services.cache_service import cache_service
+from app.core.config import ALLOWED_ORIGINS, APP_NAME, DEBUG, LOG_LEVEL, THREADPOOL_SIZE
+from app.core.log_config import setup_logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG if DEBUG else logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging (records are written in batches by a background thread)
+log_listener = setup_logging(logging.DEBUG if DEBUG else LOG_LEVEL.upper())
 logger = logging.getLogger(__name__)
 
 # Trigger reload - cache services now available
 
+# Raise the gen-0 GC threshold so per-request dicts don't trigger collections mid-request
+GC_THRESHOLD = (50000, 10, 10)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -30,20 +42,67 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info(f"Starting {APP_NAME}...")
     
+    # Size both thread pools: Starlette's (anyio, 40 by default) and asyncio.to_thread's
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=THREADPOOL_SIZE, thread_name_prefix="blocking")
+    )
+    
     try:
         # Initialize database tables
         await db_service.init_db()
         logger.info("Database initialized successfully")
+        await db_service.warm_pool()
+        db_service.start_log_flusher()
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
         raise
     
+    # Open cache connections now rather than on the first requests
+    await cache_service.warm_up()
+    await ai_service.warm_up()
+    
+    # Seed the cached-key bloom filter from Redis in the background
+    cache_service.start_bloom_sync()
+    
+    # Summarize cache hit/miss counts periodically instead of logging every lookup
+    cache_service.start_stats_log()
+    
+    # Refresh the health snapshot in the background
+    health_task = asyncio.create_task(refresh_health_loop(app))
+    
+    # Tune GC and move long-lived startup objects into the permanent generation
+    gc.set_threshold(*GC_THRESHOLD)
+    gc.freeze()
+    
     yield
     
     # Shutdown
     logger.info(f"Shutting down {APP_NAME}...")
+    health_task.cancel()
+    await ai_service.close()
+    await cache_service.close()
     await db_service.close()
     logger.info("Shutdown complete")
+    log_listener.stop()
+
+
+# Server-sent event routes end in this suffix; they must reach the client unbuffered
+EVENT_STREAM_PATH_SUFFIX = "/stream"
+
+
+class EventStreamAwareGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that passes event-stream routes through uncompressed.
+    Starlette's gzip responder buffers streamed bodies in its GzipFile without flushing per chunk,
+    so compressed SSE deltas would only reach the client when the stream ends.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].endswith(EVENT_STREAM_PATH_SUFFIX):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
 
 
 # Create FastAPI application
@@ -51,24 +110,57 @@ app = FastAPI(
     title=APP_NAME,
     description="AI Response Caching POC with two-layer caching (Memcached + Redis) and Postgres logging",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
-# Add CORS middleware (configure as needed)
+# CORS for known origins only; browsers may cache preflight results for a day
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, specify exact origins
+    allow_origins=list(ALLOWED_ORIGINS),
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,
 )
 
-# Include API routers
-app.include_router(predict_router, prefix="/api/v1")
-app.include_router(health_router, prefix="/api/v1")
-app.include_router(statistics_router, prefix="/api/v1")
+# Compress larger JSON responses (model outputs) on the wire; event streams are left as-is
+app.add_middleware(EventStreamAwareGZipMiddleware, minimum_size=1024, compresslevel=4)
+
+# Include API routers (Starlette matches in registration order, so high-traffic task routers go first)
 app.include_router(text_router, prefix="/api/v1")
+app.include_router(predict_router, prefix="/api/v1")
 app.include_router(image_router, prefix="/api/v1")
+app.include_router(statistics_router, prefix="/api/v1")
+app.include_router(health_router, prefix="/api/v1")
+
+
+# Static payloads, serialized once at import
+_ROOT_INFO = {
+    "app": APP_NAME,
+    "version": "1.0.0",
+    "status": "running",
+    "endpoints": {
+        "predict": "/api/v1/predict",
+        "health": "/api/v1/health",
+        "statistics": "/api/v1/statistics",
+        "text": {
+            "summarize": "/api/v1/text/summarize",
+            "sentiment": "/api/v1/text/sentiment",
+            "translate": "/api/v1/text/translate",
+            "chat": "/api/v1/text/chat"
+        },
+        "image": {
+            "caption": "/api/v1/image/caption",
+            "caption_upload": "/api/v1/image/upload/caption",
+            "classify": "/api/v1/image/classify",
+            "classify_upload": "/api/v1/image/upload/classify"
+        },
+        "docs": "/docs"
+    }
+}
+_ROOT_INFO_BYTES = orjson.dumps(_ROOT_INFO)
+_PING_BYTES = b'{"status":"ok"}'
 
 
 @app.get("/", tags=["Root"])
@@ -76,35 +168,29 @@ async def root():
     """
     Root endpoint with API information.
     """
-    return {
-        "app": APP_NAME,
-        "version": "1.0.0",
-        "status": "running",
-        "endpoints": {
-            "predict": "/api/v1/predict",
-            "health": "/api/v1/health",
-            "statistics": "/api/v1/statistics",
-            "text": {
-                "summarize": "/api/v1/text/summarize",
-                "sentiment": "/api/v1/text/sentiment",
-                "translate": "/api/v1/text/translate",
-                "chat": "/api/v1/text/chat"
-            },
-            "image": {
-                "caption": "/api/v1/image/caption",
-                "caption_upload": "/api/v1/image/upload/caption",
-                "classify": "/api/v1/image/classify",
-                "classify_upload": "/api/v1/image/upload/classify"
-            },
-            "docs": "/docs"
-        }
-    }
+    return Response(content=_ROOT_INFO_BYTES, media_type="application/json")
+
+
+@app.get("/ping", tags=["Root"])
+async def ping():
+    """
+    Lightweight liveness probe (used by the Docker health check).
+    """
+    return Response(content=_PING_BYTES, media_type="application/json")
 
 if __name__ == "__main__":
+    import os
+    import sys
     import uvicorn
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
+        # uvloop + httptools cut per-request framework overhead (uvloop has no Windows build)
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        workers=1 if DEBUG else os.cpu_count(),
+        backlog=2048,
+        timeout_keep_alive=75,
         reload=DEBUG
     )
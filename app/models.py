@@ -1,4 +1,4 @@
-from sqlalchemy import Column, BigInteger, String, Boolean, Integer, Float, TIMESTAMP, text, Index
+from sqlalchemy import Column, BigInteger, String, Boolean, Integer, Float, Date, TIMESTAMP, text, Index
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -15,7 +15,7 @@ class RequestLog(Base):
     id = Column(BigInteger, primary_key=True, autoincrement=True)
     
     # Request metadata
-    task_type = Column(String(100), nullable=False, index=True)  # text, image, embedding
+    task_type = Column(String(100), nullable=False)  # text, image, embedding
     operation = Column(String(100), nullable=True)  # summarize, sentiment, translate, classify, caption
     model_name = Column(String(200), nullable=True)
     
@@ -24,7 +24,7 @@ class RequestLog(Base):
     output_json = Column(JSONB, nullable=False)
     
     # Caching information
-    cache_used = Column(Boolean, default=False, index=True)
+    cache_used = Column(Boolean, default=False)
     cache_source = Column(String(20), nullable=True)  # "memcached", "redis", "none"
     cache_key = Column(String(255), nullable=True)
     
@@ -32,10 +32,30 @@ class RequestLog(Base):
     response_time_ms = Column(Float, nullable=True)
     
     # Timestamps
-    created_at = Column(TIMESTAMP(timezone=True), server_default=text('now()'), index=True)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=text('now()'))
     
-    # Composite indexes for common queries
+    # Keep indexes minimal on this append-heavy table: every INSERT maintains each one.
+    # Statistics read request_stats_daily, never these rows, so there are deliberately no
+    # B-tree or partial indexes on cache_used/cache_source. created_at grows monotonically,
+    # so a BRIN index serves ad-hoc time-range scans at a fraction of a B-tree's size and write cost.
     __table_args__ = (
         Index('idx_task_operation', 'task_type', 'operation'),
-        Index('idx_cache_performance', 'cache_used', 'cache_source', 'response_time_ms'),
+        Index('ix_logs_created_at_brin', 'created_at', postgresql_using='brin'),
     )
+
+
+class RequestStatsDaily(Base):
+    """
+    Per-day, per-task rollup of request_logs maintained by the log flusher.
+    Statistics read a handful of these rows instead of scanning the raw logs.
+    """
+    __tablename__ = "request_stats_daily"
+    
+    day = Column(Date, primary_key=True)
+    task_type = Column(String(100), primary_key=True)
+    
+    total = Column(BigInteger, nullable=False, default=0)
+    hits = Column(BigInteger, nullable=False, default=0)
+    memcached_hits = Column(BigInteger, nullable=False, default=0)
+    redis_hits = Column(BigInteger, nullable=False, default=0)
+    sum_response_ms = Column(Float, nullable=False, default=0)
@@ -3,21 +3,173 @@ Image Processing Router
 Handles image-based AI tasks: classification and captioning with URL and file upload support
 Uses Groq's Llama 4 Scout vision model - same API as text processing!
 """
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Response
+from fastapi.responses import StreamingResponse
+import asyncio
 import time
 import logging
-import base64
-import requests
-from io import BytesIO
+import orjson
+import xxhash
+from typing import Any, AsyncIterator, Awaitable, BinaryIO, Callable, Dict, Optional, Tuple
 
-from app.services.groq_vision_service import classify_image_groq, caption_image_groq, VISION_MODEL
+from app.core.config import REDIS_TTL, REDIS_STALE_TTL
+from app.services.ai_service import ai_service
+from app.services.image_download import ImageTooLargeError, download_image
+from app.services.groq_vision_service import classify_image_groq, caption_image_groq, stream_caption_groq, VISION_MODEL
 from app.services.cache_service import cache_service
 from app.services.db_service import db_service
+from app.services.pipeline import handle_cached_task, sse_event, task_response
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/image", tags=["Image Processing"])
 
+# Read uploads in 64 KiB chunks while hashing
+UPLOAD_CHUNK_SIZE = 65536
+
+# Uploads larger than this are read and hashed in a worker thread
+LARGE_UPLOAD_THRESHOLD = 4 * 1024 * 1024
+
+# Image URL downloads and ETag checks get a shorter budget than the shared client's model calls
+IMAGE_URL_TIMEOUT = 10
+
+
+def _read_and_hash_file(file: BinaryIO, size: int) -> Tuple[bytearray, str, int]:
+    """
+    Blocking chunked read + hash of an upload's underlying file (runs in a worker thread).
+    Chunks are read straight into one preallocated buffer, so the image is held in memory
+    once rather than as a chunk list plus its joined copy.
+    """
+    hasher = xxhash.xxh3_128()
+    buf = bytearray(size)
+    view = memoryview(buf)
+    pos = 0
+    file.seek(0)
+    while pos < size:
+        n = file.readinto(view[pos:pos + UPLOAD_CHUNK_SIZE])
+        if not n:
+            break
+        hasher.update(view[pos:pos + n])
+        pos += n
+    view.release()
+    if pos < size:
+        del buf[pos:]
+    return buf, hasher.hexdigest(), pos
+
+
+async def _read_and_hash_upload(image: UploadFile) -> Tuple[bytes, str, int]:
+    """
+    Read an uploaded file and hash its raw bytes.
+    Large files are read and hashed chunk by chunk off the event loop in a single worker thread;
+    small ones are read in one call and hashed in one pass, with no chunk list to join.
+    
+    Returns:
+        Tuple of (image_bytes, xxh3-128 hex digest, size in bytes)
+    """
+    if image.size is not None and image.size > LARGE_UPLOAD_THRESHOLD:
+        return await asyncio.to_thread(_read_and_hash_file, image.file, image.size)
+    
+    image_bytes = await image.read()
+    return image_bytes, xxhash.xxh3_128_hexdigest(image_bytes), len(image_bytes)
+
+
+ALLOWED_IMAGE_TYPES = frozenset({"image/jpeg", "image/jpg", "image/png", "image/gif", "image/bmp", "image/webp"})
+_INVALID_TYPE_DETAIL = f"Invalid file type. Allowed: {', '.join(sorted(ALLOWED_IMAGE_TYPES))}"
+
+
+def _validate_upload(image: UploadFile):
+    """
+    Reject uploads whose content type is not a supported image format.
+    """
+    if image.content_type not in ALLOWED_IMAGE_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=_INVALID_TYPE_DETAIL
+        )
+
+
+async def _run_model(model_fn: Callable[[bytes], Awaitable[Dict[str, Any]]], image_bytes: bytes) -> Tuple[Dict[str, Any], str]:
+    """
+    Run the Groq vision model on image bytes.
+    """
+    return await model_fn(image_bytes), "model"
+
+
+async def _process_by_content(
+    task_type: str,
+    params: Dict[str, Any],
+    image_bytes: bytes,
+    model_fn: Callable[[bytes], Awaitable[Dict[str, Any]]],
+    digest: Optional[str] = None
+) -> Tuple[Dict[str, Any], str]:
+    """
+    Look up the result by image content hash (shared with the upload endpoints)
+    before calling the model, so the same image fetched by URL or uploaded
+    only hits the model once.
+    """
+    if digest is None:
+        digest = xxhash.xxh3_128_hexdigest(image_bytes)
+    content_key = cache_service.generate_cache_key(task_type, digest, params, use_memo=False)
+    
+    cached_result, cache_source = await cache_service.get_from_cache(content_key)
+    if cached_result:
+        return cached_result, cache_source
+    
+    output, cache_source = await cache_service.single_flight(content_key, _run_model, model_fn, image_bytes)
+    cache_service.set_in_cache_nowait(content_key, output)
+    return output, cache_source
+
+
+async def _download_image(image_url: str) -> Tuple[bytes, Optional[str]]:
+    """
+    Download an image with the shared async HTTP client, returning its bytes and ETag (if any).
+    """
+    return await download_image(ai_service.http, image_url, timeout=IMAGE_URL_TIMEOUT)
+
+
+async def _etag_unchanged(image_url: str, etag: str) -> bool:
+    """
+    Revalidate a URL's image with a conditional HEAD instead of downloading it again.
+    """
+    try:
+        response = await ai_service.http.head(
+            image_url, headers={"If-None-Match": etag}, timeout=IMAGE_URL_TIMEOUT
+        )
+    except Exception as e:
+        logger.debug("ETag revalidation failed for %s: %s", image_url, e)
+        return False
+    return response.status_code == 304 or (
+        response.status_code == 200 and response.headers.get("etag") == etag
+    )
+
+
+async def _process_url(
+    task_type: str,
+    params: Dict[str, Any],
+    image_url: str,
+    model_fn: Callable[[bytes], Awaitable[Dict[str, Any]]]
+) -> Tuple[Dict[str, Any], str]:
+    """
+    Run a task for an image URL whose URL-keyed entry has expired.
+    The URL's last ETag and content hash are kept in Redis; while the ETag is unchanged
+    the content-keyed result is served after a HEAD, without re-downloading the image.
+    URLs served without an ETag never get a validator, so they are never HEAD-checked.
+    """
+    validator_key = f"image_etag:{xxhash.xxh3_128_hexdigest(image_url)}"
+    validator = await cache_service.get_json(validator_key)
+    if validator and await _etag_unchanged(image_url, validator["etag"]):
+        content_key = cache_service.generate_cache_key(task_type, validator["digest"], params, use_memo=False)
+        cached_result, cache_source = await cache_service.get_from_cache(content_key)
+        if cached_result:
+            return cached_result, cache_source
+    
+    image_bytes, etag = await _download_image(image_url)
+    digest = xxhash.xxh3_128_hexdigest(image_bytes)
+    if etag:
+        # Lives as long as the content-keyed entry it points to
+        await cache_service.set_json(validator_key, {"etag": etag, "digest": digest}, REDIS_TTL + REDIS_STALE_TTL)
+    return await _process_by_content(task_type, params, image_bytes, model_fn, digest)
+
 
 @router.post("/upload/caption")
 async def caption_uploaded_image(
@@ -38,81 +190,186 @@ async def caption_uploaded_image(
         curl -X POST "http://localhost:8000/api/v1/image/upload/caption" \\
              -F "image=@/path/to/your/image.jpg"
     """
-    start_time = time.time()
+    # Reject unsupported types before starting the timer or touching the body
+    _validate_upload(image)
+    start_time = time.perf_counter_ns()
     
     try:
-        # Validate file type
-        allowed_types = ["image/jpeg", "image/jpg", "image/png", "image/gif", "image/bmp", "image/webp"]
-        if image.content_type not in allowed_types:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid file type. Allowed: {', '.join(allowed_types)}"
-            )
-        
-        # Read image bytes
-        image_bytes = await image.read()
+        # Read image bytes, hashing the content for the cache key in the same pass
+        image_bytes, digest, size_bytes = await _read_and_hash_upload(image)
         
-        # Convert to base64 for caching key (use first 100 chars to avoid huge keys)
-        image_b64 = base64.b64encode(image_bytes).decode('utf-8')
-        cache_key = cache_service.generate_cache_key("image_captioning", image_b64[:100], {"filename": image.filename})
-        
-        # Check cache
-        cached_result, cache_source = cache_service.get_from_cache(cache_key)
-        
-        if cached_result:
-            response_time_ms = (time.time() - start_time) * 1000
-            await db_service.log_request(
-                task_type="image_captioning",
-                operation="caption_upload",
-                model_name=VISION_MODEL,
-                input_json={"filename": image.filename, "size_bytes": len(image_bytes), "content_type": image.content_type},
-                output_json=cached_result,
-                cache_used=True,
-                cache_source=cache_source,
-                cache_key=cache_key,
-                response_time_ms=response_time_ms
-            )
-            return {
-                **cached_result,
-                "filename": image.filename,
-                "size_bytes": len(image_bytes),
-                "cache_hit": True,
-                "cache_source": cache_source,
-                "response_time_ms": response_time_ms
-            }
-        
-        # Process with Groq vision model
-        output = caption_image_groq(image_bytes)
-        response_time_ms = (time.time() - start_time) * 1000
-        
-        # Cache and log
-        cache_service.set_in_cache(cache_key, output)
-        await db_service.log_request(
-            task_type="image_captioning",
-            operation="caption_upload",
+        # Keyed by content only, so URL and upload requests for the same image share entries
+        result = await handle_cached_task(
+            "image_captioning",
+            "caption_upload",
+            {"filename": image.filename, "size_bytes": size_bytes, "content_type": image.content_type},
+            {},
+            lambda: _run_model(caption_image_groq, image_bytes),
+            cache_input=digest,
             model_name=VISION_MODEL,
-            input_json={"filename": image.filename, "size_bytes": len(image_bytes), "content_type": image.content_type},
-            output_json=output,
-            cache_used=False,
-            cache_source="model",
-            cache_key=cache_key,
-            response_time_ms=response_time_ms
+            returns_source=True,
+            start_time=start_time,
+            use_memo=False
         )
-        
-        return {
-            **output,
-            "filename": image.filename,
-            "size_bytes": len(image_bytes),
-            "cache_hit": False,
-            "cache_source": "model",
-            "response_time_ms": response_time_ms
-        }
+        return task_response(result, {"filename": image.filename, "size_bytes": size_bytes})
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Image caption upload error: {e}", exc_info=True)
+        logger.error("Image caption upload error: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/upload/analyze")
+async def analyze_uploaded_image(
+    image: UploadFile = File(..., description="Image file to caption and classify"),
+    top_k: int = Form(5, description="Number of top predictions to return")
+):
+    """
+    Upload an image file and get both its caption and classification.
+    
+    The image is read and hashed once and both tasks run concurrently, sharing cache
+    entries with /upload/caption and /upload/classify. A task that fails is reported
+    in its own "error" field without failing the other.
+    
+    Returns:
+        Dictionary with "caption" and "classification" results (each with cache information)
+        and file info
+    
+    Example:
+        curl -X POST "http://localhost:8000/api/v1/image/upload/analyze" \\
+             -F "image=@/path/to/your/image.jpg"
+    """
+    _validate_upload(image)
+    start_time = time.perf_counter_ns()
+    
+    try:
+        image_bytes, digest, size_bytes = await _read_and_hash_upload(image)
+    except Exception as e:
+        logger.error("Image analyze upload error: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+    
+    input_payload = {"filename": image.filename, "size_bytes": size_bytes, "content_type": image.content_type}
+    results = await asyncio.gather(
+        handle_cached_task(
+            "image_captioning",
+            "analyze_upload",
+            input_payload,
+            {},
+            lambda: _run_model(caption_image_groq, image_bytes),
+            cache_input=digest,
+            model_name=VISION_MODEL,
+            returns_source=True,
+            start_time=start_time,
+            use_memo=False
+        ),
+        handle_cached_task(
+            "image_classification",
+            "analyze_upload",
+            {**input_payload, "top_k": top_k},
+            {"top_k": top_k},
+            lambda: _run_model(classify_image_groq, image_bytes),
+            cache_input=digest,
+            model_name=VISION_MODEL,
+            returns_source=True,
+            start_time=start_time,
+            use_memo=False
+        ),
+        return_exceptions=True
+    )
+    
+    body = {"filename": image.filename, "size_bytes": size_bytes}
+    for name, result in zip(("caption", "classification"), results):
+        if isinstance(result, Exception):
+            logger.error("Image analyze %s error: %s", name, result)
+            body[name] = {"error": str(result)}
+        elif isinstance(result, BaseException):
+            # return_exceptions also hands back a cancelled subtask's CancelledError; propagate it
+            raise result
+        else:
+            # Embed each task's already-encoded response as-is
+            body[name] = orjson.Fragment(task_response(result).body)
+    return Response(content=orjson.dumps(body), media_type="application/json")
+
+
+async def _stream_caption_events(
+    image_bytes: bytes,
+    digest: str,
+    input_payload: Dict[str, Any],
+    start_time: int
+) -> AsyncIterator[bytes]:
+    """
+    Server-sent events for an uploaded image's caption: a cached caption is sent whole,
+    otherwise model deltas are forwarded as they arrive and the full caption is cached at the end.
+    The final event carries the complete caption and cache metadata, or an error.
+    """
+    cache_key = cache_service.generate_cache_key("image_captioning", digest, {}, use_memo=False)
+    output, cache_source = await cache_service.get_from_cache(cache_key)
+    
+    if output:
+        yield sse_event({"delta": output["caption"]})
+    else:
+        pieces = []
+        try:
+            async for delta in stream_caption_groq(image_bytes):
+                pieces.append(delta)
+                yield sse_event({"delta": delta})
+        except Exception as e:
+            logger.error("Image caption stream error: %s", e, exc_info=True)
+            yield sse_event({"error": str(e), "done": True})
+            return
+        output = {"caption": "".join(pieces).strip(), "model_used": VISION_MODEL}
+        cache_source = "model"
+        cache_service.set_in_cache_nowait(cache_key, output)
+    
+    response_time_ms = (time.perf_counter_ns() - start_time) / 1_000_000
+    cache_used = cache_source != "model"
+    db_service.enqueue_log(
+        task_type="image_captioning",
+        operation="caption_upload_stream",
+        model_name=VISION_MODEL,
+        input_json=input_payload,
+        output_json=output,
+        cache_used=cache_used,
+        cache_source=cache_source,
+        cache_key=cache_key,
+        response_time_ms=response_time_ms
+    )
+    yield sse_event({
+        **output,
+        "done": True,
+        "cache_hit": cache_used,
+        "cache_source": cache_source,
+        "response_time_ms": response_time_ms
+    })
+
+
+@router.post("/upload/caption/stream")
+async def stream_caption_uploaded_image(
+    image: UploadFile = File(..., description="Image file to caption")
+):
+    """
+    Upload an image file and stream its caption as server-sent events.
+    
+    Each event is a JSON object with a "delta" of caption text; the last one has
+    "done": true and either the full caption with cache information, or an "error".
+    Shares cache entries with /upload/caption. Sent uncompressed, so deltas are not
+    held back by GZip.
+    
+    Example:
+        curl -N -X POST "http://localhost:8000/api/v1/image/upload/caption/stream" \\
+             -F "image=@/path/to/your/image.jpg"
+    """
+    _validate_upload(image)
+    start_time = time.perf_counter_ns()
+    
+    image_bytes, digest, size_bytes = await _read_and_hash_upload(image)
+    input_payload = {"filename": image.filename, "size_bytes": size_bytes, "content_type": image.content_type}
+    return StreamingResponse(
+        _stream_caption_events(image_bytes, digest, input_payload, start_time),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
 
 
 @router.post("/caption")
@@ -132,62 +389,22 @@ async def caption_image_url(
         curl -X POST "http://localhost:8000/api/v1/image/caption" \\
              -F "image_url=https://example.com/image.jpg"
     """
-    start_time = time.time()
-    
     try:
-        cache_key = cache_service.generate_cache_key("image_captioning", image_url, {})
-        cached_result, cache_source = cache_service.get_from_cache(cache_key)
-        
-        if cached_result:
-            response_time_ms = (time.time() - start_time) * 1000
-            await db_service.log_request(
-                task_type="image_captioning",
-                operation="caption",
-                model_name=VISION_MODEL,
-                input_json={"image_url": image_url},
-                output_json=cached_result,
-                cache_used=True,
-                cache_source=cache_source,
-                cache_key=cache_key,
-                response_time_ms=response_time_ms
-            )
-            return {
-                **cached_result,
-                "cache_hit": True,
-                "cache_source": cache_source,
-                "response_time_ms": response_time_ms
-            }
-        
-        # Download image from URL
-        response = requests.get(image_url, timeout=10)
-        response.raise_for_status()
-        image_bytes = response.content
-        
-        # Process with Groq vision model
-        output = caption_image_groq(image_bytes)
-        response_time_ms = (time.time() - start_time) * 1000
-        
-        cache_service.set_in_cache(cache_key, output)
-        await db_service.log_request(
-            task_type="image_captioning",
-            operation="caption",
+        result = await handle_cached_task(
+            "image_captioning",
+            "caption",
+            {"image_url": image_url},
+            {},
+            lambda: _process_url("image_captioning", {}, image_url, caption_image_groq),
+            cache_input=image_url,
             model_name=VISION_MODEL,
-            input_json={"image_url": image_url},
-            output_json=output,
-            cache_used=False,
-            cache_source="model",
-            cache_key=cache_key,
-            response_time_ms=response_time_ms
+            returns_source=True
         )
-        
-        return {
-            **output,
-            "cache_hit": False,
-            "cache_source": "model",
-            "response_time_ms": response_time_ms
-        }
+        return task_response(result)
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
-        logger.error(f"Image caption error: {e}", exc_info=True)
+        logger.error("Image caption error: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -211,63 +428,24 @@ async def classify_image_url(
              -F "image_url=https://example.com/image.jpg" \\
              -F "top_k=5"
     """
-    start_time = time.time()
-    
     try:
         params = {"top_k": top_k}
-        cache_key = cache_service.generate_cache_key("image_classification", image_url, params)
-        cached_result, cache_source = cache_service.get_from_cache(cache_key)
-        
-        if cached_result:
-            response_time_ms = (time.time() - start_time) * 1000
-            await db_service.log_request(
-                task_type="image_classification",
-                operation="classify",
-                model_name=VISION_MODEL,
-                input_json={"image_url": image_url, "top_k": top_k},
-                output_json=cached_result,
-                cache_used=True,
-                cache_source=cache_source,
-                cache_key=cache_key,
-                response_time_ms=response_time_ms
-            )
-            return {
-                **cached_result,
-                "cache_hit": True,
-                "cache_source": cache_source,
-                "response_time_ms": response_time_ms
-            }
         
-        # Download image from URL
-        response = requests.get(image_url, timeout=10)
-        response.raise_for_status()
-        image_bytes = response.content
-        
-        # Process with Groq vision model
-        output = classify_image_groq(image_bytes)
-        response_time_ms = (time.time() - start_time) * 1000
-        
-        cache_service.set_in_cache(cache_key, output)
-        await db_service.log_request(
-            task_type="image_classification",
-            operation="classify",
+        result = await handle_cached_task(
+            "image_classification",
+            "classify",
+            {"image_url": image_url, "top_k": top_k},
+            params,
+            lambda: _process_url("image_classification", params, image_url, classify_image_groq),
+            cache_input=image_url,
             model_name=VISION_MODEL,
-            input_json={"image_url": image_url, "top_k": top_k},
-            output_json=output,
-            cache_used=False,
-            cache_source="model",
-            cache_key=cache_key,
-            response_time_ms=response_time_ms
+            returns_source=True
         )
-        
-        return {
-            **output,
-            "cache_hit": False,
-            "cache_source": "model",
-            "response_time_ms": response_time_ms
-        }
+        return task_response(result)
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
-        logger.error(f"Image classification error: {e}", exc_info=True)
+        logger.error("Image classification error: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -293,79 +471,31 @@ async def classify_uploaded_image(
              -F "image=@/path/to/your/image.jpg" \\
              -F "top_k=5"
     """
-    start_time = time.time()
+    # Reject unsupported types before starting the timer or touching the body
+    _validate_upload(image)
+    start_time = time.perf_counter_ns()
     
     try:
-        # Validate file type
-        allowed_types = ["image/jpeg", "image/jpg", "image/png", "image/gif", "image/bmp", "image/webp"]
-        if image.content_type not in allowed_types:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid file type. Allowed: {', '.join(allowed_types)}"
-            )
+        # Read image bytes, hashing the content for the cache key in the same pass
+        image_bytes, digest, size_bytes = await _read_and_hash_upload(image)
         
-        # Read image bytes
-        image_bytes = await image.read()
-        
-        # Convert to base64 for caching key (use first 100 chars to avoid huge keys)
-        image_b64 = base64.b64encode(image_bytes).decode('utf-8')
-        params = {"top_k": top_k, "filename": image.filename}
-        cache_key = cache_service.generate_cache_key("image_classification", image_b64[:100], params)
-        
-        # Check cache
-        cached_result, cache_source = cache_service.get_from_cache(cache_key)
-        
-        if cached_result:
-            response_time_ms = (time.time() - start_time) * 1000
-            await db_service.log_request(
-                task_type="image_classification",
-                operation="classify_upload",
-                model_name=VISION_MODEL,
-                input_json={"filename": image.filename, "size_bytes": len(image_bytes), "content_type": image.content_type, "top_k": top_k},
-                output_json=cached_result,
-                cache_used=True,
-                cache_source=cache_source,
-                cache_key=cache_key,
-                response_time_ms=response_time_ms
-            )
-            return {
-                **cached_result,
-                "filename": image.filename,
-                "size_bytes": len(image_bytes),
-                "cache_hit": True,
-                "cache_source": cache_source,
-                "response_time_ms": response_time_ms
-            }
-        
-        # Process with Groq vision model
-        output = classify_image_groq(image_bytes)
-        response_time_ms = (time.time() - start_time) * 1000
-        
-        # Cache and log
-        cache_service.set_in_cache(cache_key, output)
-        await db_service.log_request(
-            task_type="image_classification",
-            operation="classify_upload",
+        # Keyed by content only, so URL and upload requests for the same image share entries
+        result = await handle_cached_task(
+            "image_classification",
+            "classify_upload",
+            {"filename": image.filename, "size_bytes": size_bytes, "content_type": image.content_type, "top_k": top_k},
+            {"top_k": top_k},
+            lambda: _run_model(classify_image_groq, image_bytes),
+            cache_input=digest,
             model_name=VISION_MODEL,
-            input_json={"filename": image.filename, "size_bytes": len(image_bytes), "content_type": image.content_type, "top_k": top_k},
-            output_json=output,
-            cache_used=False,
-            cache_source="model",
-            cache_key=cache_key,
-            response_time_ms=response_time_ms
+            returns_source=True,
+            start_time=start_time,
+            use_memo=False
         )
-        
-        return {
-            **output,
-            "filename": image.filename,
-            "size_bytes": len(image_bytes),
-            "cache_hit": False,
-            "cache_source": "model",
-            "response_time_ms": response_time_ms
-        }
+        return task_response(result, {"filename": image.filename, "size_bytes": size_bytes})
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Image classification upload error: {e}", exc_info=True)
+        logger.error("Image classification upload error: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -2,14 +2,14 @@
 General Prediction Router
 Handles the main /predict endpoint supporting both text and image tasks
 """
-from fastapi import APIRouter, HTTPException, status
-import time
+from fastapi import APIRouter, HTTPException, Response, status
+from datetime import datetime
 import logging
+import orjson
 
 from app.schemas import PredictRequest, PredictResponse
-from app.services.ai_service import ai_service
-from app.services.cache_service import cache_service
-from app.services.db_service import db_service
+from app.services.ai_service import PASSTHROUGH_MODEL, ai_service
+from app.services.pipeline import handle_cached_task, request_fields, with_fields
 
 logger = logging.getLogger(__name__)
 
@@ -30,8 +30,6 @@ async def predict(req: PredictRequest):
     Returns:
         PredictResponse with output, cache information, and performance metrics
     """
-    start_time = time.time()
-    
     try:
         # Validate input
         if not req.task_type or req.input is None:
@@ -40,45 +38,6 @@ async def predict(req: PredictRequest):
                 detail="task_type and input are required"
             )
         
-        # Generate cache key
-        cache_key = cache_service.generate_cache_key(
-            req.task_type,
-            req.input,
-            req.params
-        )
-        
-        # Check cache (L1: Memcached, L2: Redis)
-        cached_result, cache_source = cache_service.get_from_cache(cache_key)
-        
-        if cached_result:
-            # Cache hit!
-            response_time_ms = (time.time() - start_time) * 1000
-            
-            # Log to database
-            await db_service.log_request(
-                task_type=req.task_type,
-                operation=req.params.get("operation") if req.params else None,
-                model_name=cached_result.get("model", req.model or "cached"),
-                input_json={"input": req.input, "params": req.params},
-                output_json=cached_result,
-                cache_used=True,
-                cache_source=cache_source,
-                cache_key=cache_key,
-                response_time_ms=response_time_ms
-            )
-            
-            return PredictResponse(
-                output=cached_result,
-                cache_source=cache_source,
-                response_time_ms=response_time_ms,
-                model_name=cached_result.get("model", req.model or "cached"),
-                task_type=req.task_type,
-                cache_key=cache_key
-            )
-        
-        # Cache miss - call AI model
-        logger.info(f"Cache miss for task: {req.task_type}")
-        
         # Determine if text or image task
         is_image_task = req.task_type in ["image_classification", "image_captioning"]
         
@@ -95,11 +54,10 @@ async def predict(req: PredictRequest):
                     detail="Image URL required for image tasks"
                 )
             
-            output = ai_service.process_image_task(
-                req.task_type,
-                image_source,
-                req.params
-            )
+            cache_input = image_source
+            fields = {}
+            model_name = req.model
+            compute = lambda: ai_service.process_image_task(req.task_type, image_source, req.params)
         else:
             # Text task
             if isinstance(req.input, dict):
@@ -113,44 +71,43 @@ async def predict(req: PredictRequest):
                     detail="Text input required for text tasks"
                 )
             
-            output = ai_service.process_text_task(
-                req.task_type,
-                text,
-                req.params
-            )
-        
-        model_name = req.model or output.get("model", "default")
-        response_time_ms = (time.time() - start_time) * 1000
+            cache_input = text
+            fields = request_fields(req.task_type, text)
+            # Record outputs that never reached a model as such
+            model_name = PASSTHROUGH_MODEL if ai_service.is_passthrough(req.task_type, text, req.params) else req.model
+            compute = lambda: ai_service.process_text_task(req.task_type, text, req.params)
         
-        # Store in cache
-        cache_service.set_in_cache(cache_key, output)
-        
-        # Log to database
-        await db_service.log_request(
-            task_type=req.task_type,
-            operation=req.params.get("operation") if req.params else None,
+        # Key on the extracted text/URL so dict and plain-string inputs share cache entries.
+        # Cache lookup (L0/L1/L2), single-flight model call on miss, and logging
+        result = await handle_cached_task(
+            req.task_type,
+            req.params.get("operation") if req.params else None,
+            {"input": req.input, "params": req.params},
+            req.params,
+            compute,
+            cache_input=cache_input,
             model_name=model_name,
-            input_json={"input": req.input, "params": req.params},
-            output_json=output,
-            cache_used=False,
-            cache_source="model",
-            cache_key=cache_key,
-            response_time_ms=response_time_ms
+            raw=True
         )
         
-        return PredictResponse(
-            output=output,
-            cache_source="model",
-            response_time_ms=response_time_ms,
-            model_name=model_name,
-            task_type=req.task_type,
-            cache_key=cache_key
-        )
+        # Same fields as PredictResponse; a cache hit's stored JSON is embedded as-is
+        # rather than decoded into a dict and re-encoded, unless per-request fields are added
+        output = with_fields(result.output, fields)
+        body = orjson.dumps({
+            "output": orjson.Fragment(output) if isinstance(output, bytes) else output,
+            "cache_source": result.cache_source,
+            "response_time_ms": result.response_time_ms,
+            "model_name": result.model_name,
+            "task_type": req.task_type,
+            "timestamp": datetime.utcnow(),
+            "cache_key": result.cache_key
+        })
+        return Response(content=body, media_type="application/json")
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error processing request: {e}", exc_info=True)
+        logger.error("Error processing request: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Internal server error: {str(e)}"
@@ -3,15 +3,31 @@ Statistics Router
 Handles cache performance and usage statistics endpoints
 """
 from fastapi import APIRouter, HTTPException
+from cachetools import TTLCache
 import logging
 
+from app.core.config import STATS_CACHE_TTL
 from app.schemas import CacheStatistics
+from app.services.cache_service import cache_service
 from app.services.db_service import db_service
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/statistics", tags=["Statistics"])
 
+# Per-worker copy of recent results, so repeat polls skip the Redis round-trip too
+STATS_MEMO_TTL = 5  # seconds
+_stats_memo: TTLCache = TTLCache(maxsize=64, ttl=STATS_MEMO_TTL)
+
+
+async def _load_statistics(stats_key: str, days: int):
+    """
+    Aggregate statistics from the database and cache them in Redis.
+    """
+    stats = await db_service.get_statistics(days)
+    await cache_service.set_json(stats_key, stats, ttl=STATS_CACHE_TTL)
+    return stats
+
 
 @router.get("", response_model=CacheStatistics)
 async def get_statistics(days: int = 7):
@@ -24,21 +40,23 @@ async def get_statistics(days: int = 7):
     Returns:
         CacheStatistics: Cache performance metrics including hit rates and response times
     """
+    stats = _stats_memo.get(days)
+    if stats is not None:
+        return stats
+    
     try:
-        stats = await db_service.get_statistics(days)
+        # Dashboards poll this endpoint; serve recent results from Redis
+        stats_key = f"stats:{days}"
+        stats = await cache_service.get_json(stats_key)
+        if stats is None:
+            # Dashboards refreshing together after expiry share one database query
+            stats = await cache_service.single_flight(stats_key, _load_statistics, stats_key, days)
         
-        return CacheStatistics(
-            total_requests=stats["total_requests"],
-            cache_hits=stats["cache_hits"],
-            cache_misses=stats["cache_misses"],
-            memcached_hits=stats["memcached_hits"],
-            redis_hits=stats["redis_hits"],
-            average_response_time_ms=stats["average_response_time_ms"],
-            cache_hit_rate=stats["cache_hit_rate"],
-            time_period=f"last_{days}_days"
-        )
+        stats = CacheStatistics(**stats)
+        _stats_memo[days] = stats
+        return stats
     except Exception as e:
-        logger.error(f"Error getting statistics: {e}")
+        logger.error("Error getting statistics: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Failed to retrieve statistics"
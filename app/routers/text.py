@@ -3,17 +3,105 @@ Text Processing Router
 Handles text-based AI tasks: summarization, sentiment analysis, translation, chat
 """
 from fastapi import APIRouter, HTTPException, Form
-import time
+from fastapi.responses import StreamingResponse
 import logging
+import time
+from typing import AsyncIterator
 
-from app.services.ai_service import ai_service
+from app.core.config import GROQ_MODEL, LOG_HIT_OUTPUTS
+from app.services.ai_service import PASSTHROUGH_MODEL, ai_service
 from app.services.cache_service import cache_service
 from app.services.db_service import db_service
+from app.schemas import ChatRequest, SentimentRequest, SummarizeRequest, TranslateRequest
+from app.services.pipeline import handle_cached_task, normalize_text, request_fields, sse_event, task_response
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/text", tags=["Text Processing"])
 
+# The Groq model ai_service calls for text tasks, recorded in every log row
+MODEL_NAME = GROQ_MODEL
+
+
+async def _summarize(text: str, max_length: int):
+    try:
+        params = {"max_length": max_length}
+        result = await handle_cached_task(
+            "summarization",
+            "summarize",
+            {"text": text, "max_length": max_length},
+            params,
+            lambda: ai_service.process_text_task("summarization", text, params),
+            cache_input=normalize_text(text),
+            model_name=PASSTHROUGH_MODEL if ai_service.is_passthrough("summarization", text, params) else MODEL_NAME,
+            raw=True,
+            stale_while_revalidate=True
+        )
+        # The cached output is shared by inputs that differ only in spacing; describe this one
+        return task_response(result, request_fields("summarization", text))
+    except Exception as e:
+        logger.error("Summarization error: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _analyze_sentiment(text: str):
+    try:
+        result = await handle_cached_task(
+            "sentiment",
+            "analyze",
+            {"text": text},
+            {},
+            lambda: ai_service.process_text_task("sentiment", text, {}),
+            # Sentiment doesn't depend on case or spacing
+            cache_input=normalize_text(text, casefold=True),
+            model_name=MODEL_NAME,
+            raw=True
+        )
+        # The cached output is shared by inputs that differ only in case or spacing; echo this one
+        return task_response(result, request_fields("sentiment", text))
+    except Exception as e:
+        logger.error("Sentiment analysis error: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _translate(text: str, target_language: str):
+    try:
+        params = {"target_language": target_language}
+        result = await handle_cached_task(
+            "translation",
+            "translate",
+            {"text": text, "target_language": target_language},
+            params,
+            lambda: ai_service.process_text_task("translation", text, params),
+            cache_input=text,
+            model_name=MODEL_NAME,
+            raw=True,
+            stale_while_revalidate=True
+        )
+        return task_response(result)
+    except Exception as e:
+        logger.error("Translation error: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _chat(message: str):
+    try:
+        result = await handle_cached_task(
+            "chat",
+            "chat",
+            {"message": message},
+            {},
+            lambda: ai_service.process_text_task("chat", message, {}),
+            cache_input=message,
+            model_name=MODEL_NAME,
+            raw=True,
+            semantic=True
+        )
+        return task_response(result)
+    except Exception as e:
+        logger.error("Chat error: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 
 @router.post("/summarize")
 async def summarize_text(
@@ -35,66 +123,7 @@ async def summarize_text(
              -F "text=Your long text here..." \\
              -F "max_length=50"
     """
-    start_time = time.time()
-    
-    try:
-        # Generate cache key
-        cache_key = cache_service.generate_cache_key(
-            "summarization",
-            text,
-            {"max_length": max_length}
-        )
-        
-        # Check cache
-        cached_result, cache_source = cache_service.get_from_cache(cache_key)
-        
-        if cached_result:
-            response_time_ms = (time.time() - start_time) * 1000
-            await db_service.log_request(
-                task_type="summarization",
-                operation="summarize",
-                model_name="llama-3.1-8b-instant",
-                input_json={"text": text, "max_length": max_length},
-                output_json=cached_result,
-                cache_used=True,
-                cache_source=cache_source,
-                cache_key=cache_key,
-                response_time_ms=response_time_ms
-            )
-            return {
-                **cached_result,
-                "cache_hit": True,
-                "cache_source": cache_source,
-                "response_time_ms": response_time_ms
-            }
-        
-        # Call AI
-        output = ai_service.process_text_task("summarization", text, {"max_length": max_length})
-        response_time_ms = (time.time() - start_time) * 1000
-        
-        # Cache and log
-        cache_service.set_in_cache(cache_key, output)
-        await db_service.log_request(
-            task_type="summarization",
-            operation="summarize",
-            model_name="llama-3.1-8b-instant",
-            input_json={"text": text, "max_length": max_length},
-            output_json=output,
-            cache_used=False,
-            cache_source="model",
-            cache_key=cache_key,
-            response_time_ms=response_time_ms
-        )
-        
-        return {
-            **output,
-            "cache_hit": False,
-            "cache_source": "model",
-            "response_time_ms": response_time_ms
-        }
-    except Exception as e:
-        logger.error(f"Summarization error: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+    return await _summarize(text, max_length)
 
 
 @router.post("/sentiment")
@@ -114,57 +143,7 @@ async def analyze_sentiment(
         curl -X POST "http://localhost:8000/api/v1/text/sentiment" \\
              -F "text=I love this product!"
     """
-    start_time = time.time()
-    
-    try:
-        cache_key = cache_service.generate_cache_key("sentiment", text, {})
-        cached_result, cache_source = cache_service.get_from_cache(cache_key)
-        
-        if cached_result:
-            response_time_ms = (time.time() - start_time) * 1000
-            await db_service.log_request(
-                task_type="sentiment",
-                operation="analyze",
-                model_name="llama-3.1-8b-instant",
-                input_json={"text": text},
-                output_json=cached_result,
-                cache_used=True,
-                cache_source=cache_source,
-                cache_key=cache_key,
-                response_time_ms=response_time_ms
-            )
-            return {
-                **cached_result,
-                "cache_hit": True,
-                "cache_source": cache_source,
-                "response_time_ms": response_time_ms
-            }
-        
-        output = ai_service.process_text_task("sentiment", text, {})
-        response_time_ms = (time.time() - start_time) * 1000
-        
-        cache_service.set_in_cache(cache_key, output)
-        await db_service.log_request(
-            task_type="sentiment",
-            operation="analyze",
-            model_name="llama-3.1-8b-instant",
-            input_json={"text": text},
-            output_json=output,
-            cache_used=False,
-            cache_source="model",
-            cache_key=cache_key,
-            response_time_ms=response_time_ms
-        )
-        
-        return {
-            **output,
-            "cache_hit": False,
-            "cache_source": "model",
-            "response_time_ms": response_time_ms
-        }
-    except Exception as e:
-        logger.error(f"Sentiment analysis error: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+    return await _analyze_sentiment(text)
 
 
 @router.post("/translate")
@@ -187,58 +166,7 @@ async def translate_text(
              -F "text=Hello, how are you?" \\
              -F "target_language=Spanish"
     """
-    start_time = time.time()
-    
-    try:
-        params = {"target_language": target_language}
-        cache_key = cache_service.generate_cache_key("translation", text, params)
-        cached_result, cache_source = cache_service.get_from_cache(cache_key)
-        
-        if cached_result:
-            response_time_ms = (time.time() - start_time) * 1000
-            await db_service.log_request(
-                task_type="translation",
-                operation="translate",
-                model_name="llama-3.1-8b-instant",
-                input_json={"text": text, "target_language": target_language},
-                output_json=cached_result,
-                cache_used=True,
-                cache_source=cache_source,
-                cache_key=cache_key,
-                response_time_ms=response_time_ms
-            )
-            return {
-                **cached_result,
-                "cache_hit": True,
-                "cache_source": cache_source,
-                "response_time_ms": response_time_ms
-            }
-        
-        output = ai_service.process_text_task("translation", text, params)
-        response_time_ms = (time.time() - start_time) * 1000
-        
-        cache_service.set_in_cache(cache_key, output)
-        await db_service.log_request(
-            task_type="translation",
-            operation="translate",
-            model_name="llama-3.1-8b-instant",
-            input_json={"text": text, "target_language": target_language},
-            output_json=output,
-            cache_used=False,
-            cache_source="model",
-            cache_key=cache_key,
-            response_time_ms=response_time_ms
-        )
-        
-        return {
-            **output,
-            "cache_hit": False,
-            "cache_source": "model",
-            "response_time_ms": response_time_ms
-        }
-    except Exception as e:
-        logger.error(f"Translation error: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+    return await _translate(text, target_language)
 
 
 @router.post("/chat")
@@ -258,54 +186,114 @@ async def chat(
         curl -X POST "http://localhost:8000/api/v1/text/chat" \\
              -F "message=What is the capital of France?"
     """
-    start_time = time.time()
+    return await _chat(message)
+
+
+async def _stream_chat_events(message: str, start_time: int) -> AsyncIterator[bytes]:
+    """
+    Server-sent events for a chat reply: a cached reply is sent whole, otherwise model deltas
+    are forwarded as they arrive and the full reply is cached at the end (shared with /chat).
+    The final event carries the complete reply and cache metadata, or an error.
+    """
+    cache_key = cache_service.generate_cache_key("chat", message, {})
+    output, cache_source = await cache_service.get_from_cache(cache_key)
     
-    try:
-        cache_key = cache_service.generate_cache_key("chat", message, {})
-        cached_result, cache_source = cache_service.get_from_cache(cache_key)
-        
-        if cached_result:
-            response_time_ms = (time.time() - start_time) * 1000
-            await db_service.log_request(
-                task_type="chat",
-                operation="chat",
-                model_name="llama-3.1-8b-instant",
-                input_json={"message": message},
-                output_json=cached_result,
-                cache_used=True,
-                cache_source=cache_source,
-                cache_key=cache_key,
-                response_time_ms=response_time_ms
-            )
-            return {
-                **cached_result,
-                "cache_hit": True,
-                "cache_source": cache_source,
-                "response_time_ms": response_time_ms
-            }
-        
-        output = ai_service.process_text_task("chat", message, {})
-        response_time_ms = (time.time() - start_time) * 1000
-        
-        cache_service.set_in_cache(cache_key, output)
-        await db_service.log_request(
-            task_type="chat",
-            operation="chat",
-            model_name="llama-3.1-8b-instant",
-            input_json={"message": message},
-            output_json=output,
-            cache_used=False,
-            cache_source="model",
-            cache_key=cache_key,
-            response_time_ms=response_time_ms
-        )
-        
-        return {
-            **output,
-            "cache_hit": False,
-            "cache_source": "model",
-            "response_time_ms": response_time_ms
-        }
-    except Exception as e:
-        logger.error(f"Chat error: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+    if output:
+        yield sse_event({"delta": output["response"]})
+    else:
+        pieces = []
+        try:
+            async for delta in ai_service.stream_text(message):
+                pieces.append(delta)
+                yield sse_event({"delta": delta})
+        except Exception as e:
+            logger.error("Chat stream error: %s", e, exc_info=True)
+            yield sse_event({"error": str(e), "done": True})
+            return
+        # Same shape as process_text_task's chat output, so /chat can serve this entry
+        output = {"response": "".join(pieces).strip(), "input": message}
+        cache_source = "model"
+        cache_service.set_in_cache_nowait(cache_key, output)
+    
+    response_time_ms = (time.perf_counter_ns() - start_time) / 1_000_000
+    cache_used = cache_source != "model"
+    db_service.enqueue_log(
+        task_type="chat",
+        operation="chat_stream",
+        model_name=MODEL_NAME,
+        input_json={"message": message},
+        # As in handle_cached_task: a hit's output was already logged by its model call
+        output_json={} if cache_used and not LOG_HIT_OUTPUTS else output,
+        cache_used=cache_used,
+        cache_source=cache_source,
+        cache_key=cache_key,
+        response_time_ms=response_time_ms
+    )
+    yield sse_event({
+        **output,
+        "done": True,
+        "cache_hit": cache_used,
+        "cache_source": cache_source,
+        "response_time_ms": response_time_ms
+    })
+
+
+@router.post("/chat/stream")
+async def stream_chat(
+    message: str = Form(..., description="Your message")
+):
+    """
+    Chat with AI, streaming the reply as server-sent events.
+    
+    Each event is a JSON object with a "delta" of reply text; the last one has
+    "done": true and either the full response with cache information, or an "error".
+    Shares cache entries with /chat. Sent uncompressed, so deltas are not held back by GZip.
+    
+    Example:
+        curl -N -X POST "http://localhost:8000/api/v1/text/chat/stream" \\
+             -F "message=What is the capital of France?"
+    """
+    return StreamingResponse(
+        _stream_chat_events(message, time.perf_counter_ns()),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+# JSON variants of the form endpoints: same caching and responses, without multipart parsing
+
+@router.post("/summarize/json")
+async def summarize_text_json(body: SummarizeRequest):
+    """
+    Summarize text - JSON body.
+    
+    Example:
+        curl -X POST "http://localhost:8000/api/v1/text/summarize/json" \\
+             -H "Content-Type: application/json" \\
+             -d '{"text": "Your long text here...", "max_length": 50}'
+    """
+    return await _summarize(body.text, body.max_length)
+
+
+@router.post("/sentiment/json")
+async def analyze_sentiment_json(body: SentimentRequest):
+    """
+    Analyze sentiment of text - JSON body.
+    """
+    return await _analyze_sentiment(body.text)
+
+
+@router.post("/translate/json")
+async def translate_text_json(body: TranslateRequest):
+    """
+    Translate text to another language - JSON body.
+    """
+    return await _translate(body.text, body.target_language)
+
+
+@router.post("/chat/json")
+async def chat_json(body: ChatRequest):
+    """
+    Chat with AI - JSON body.
+    """
+    return await _chat(body.message)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, HttpUrl, Field
+from pydantic import BaseModel, ConfigDict, HttpUrl, Field
 from typing import Any, Dict, Optional
 from datetime import datetime
 from enum import Enum
@@ -22,8 +22,9 @@ class PredictRequest(BaseModel):
     input: Any = Field(..., description="Input data: text string, image URL, or structured payload")
     params: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Additional parameters for the model")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        extra="ignore",
+        json_schema_extra={
             "examples": [
                 {
                     "task_type": "summarization",
@@ -42,19 +43,22 @@ class PredictRequest(BaseModel):
                 }
             ]
         }
+    )
 
 
 class PredictResponse(BaseModel):
     output: Any = Field(..., description="AI model output")
-    cache_source: str = Field(..., description="Cache source: 'memcached', 'redis', or 'model' (no cache)")
+    cache_source: str = Field(..., description="Cache source: 'memory', 'memcached', 'redis', 'local_fallback', 'semantic' (near-duplicate prompt), or 'model' (no cache)")
     response_time_ms: float = Field(..., description="Total response time in milliseconds")
     model_name: Optional[str] = Field(None, description="Name of the model used")
     task_type: Optional[str] = Field(None, description="Task type that was executed")
     timestamp: Optional[datetime] = Field(default_factory=datetime.utcnow, description="Response timestamp")
     cache_key: Optional[str] = Field(None, description="Cache key used for this request")
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        extra="ignore",
+        protected_namespaces=(),
+        json_schema_extra={
             "example": {
                 "output": {"summary": "This is a summary of the text."},
                 "cache_source": "memcached",
@@ -64,10 +68,32 @@ class PredictResponse(BaseModel):
                 "timestamp": "2025-11-03T10:00:00Z"
             }
         }
+    )
+
+
+# JSON bodies for the /text endpoints
+class SummarizeRequest(BaseModel):
+    text: str = Field(..., description="Text to summarize")
+    max_length: int = Field(100, description="Maximum length of summary")
+
+
+class SentimentRequest(BaseModel):
+    text: str = Field(..., description="Text to analyze sentiment")
+
+
+class TranslateRequest(BaseModel):
+    text: str = Field(..., description="Text to translate")
+    target_language: str = Field("Spanish", description="Target language")
+
+
+class ChatRequest(BaseModel):
+    message: str = Field(..., description="Your message")
 
 
 # Health Check Schema
 class HealthCheck(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     status: str = "healthy"
     redis_connected: bool
     memcached_connected: bool
@@ -1,13 +1,50 @@
-import time
+import functools
 import logging
-import requests
-from typing import Dict, Any, Tuple
-from io import BytesIO
+import httpx
+import orjson
+from typing import AsyncIterator, Dict, Any, Optional
 
 from app.core.config import GROQ_API_KEY, GROQ_MODEL
+from app.services.image_download import download_image
 
 logger = logging.getLogger(__name__)
 
+GROQ_CHAT_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_MODELS_URL = "https://api.groq.com/openai/v1/models"
+
+# Prompt templates per text task, filled with str.format_map (chat sends the text as-is)
+TEXT_PROMPT_TEMPLATES = {
+    "summarization": """You are a text summarization assistant. Your task is to create a SHORTER, CONDENSED summary.
+
+CRITICAL RULES:
+- The summary MUST be shorter than the original text
+- Maximum length: {max_length} words
+- Be concise and capture only the key points
+- Do not add explanations or extra details
+- Just provide the summary, nothing else
+
+Original text ({word_count} words):
+{text}
+
+Provide a summary in {max_length} words or less:""",
+    "sentiment": "Analyze the sentiment of the following text. Respond with only: positive, negative, or neutral.\n\nText: {text}\n\nSentiment:",
+    "translation": "Translate the following text to {target_language}:\n\n{text}\n\nTranslation:",
+    "qa": "Context: {context}\n\nQuestion: {text}\n\nAnswer:"
+}
+
+SENTIMENT_LABELS = frozenset({"positive", "negative", "neutral"})
+
+# Model name logged for outputs answered without a model call (see AIService.is_passthrough)
+PASSTHROUGH_MODEL = "passthrough"
+
+
+@functools.lru_cache(maxsize=1024)
+def _word_count(text: str) -> int:
+    """
+    Word count of a text, memoized so repeated summarization inputs are only split once.
+    """
+    return len(text.split())
+
 
 class AIService:
     """
@@ -17,33 +54,95 @@ class AIService:
     def __init__(self):
         self.groq_api_key = GROQ_API_KEY
         self.groq_model = GROQ_MODEL
+        
+        # Built once instead of per call
+        self._groq_headers = {
+            "Authorization": f"Bearer {self.groq_api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        # Pooled keep-alive client for Groq calls and image downloads, created on first use
+        self._http: Optional[httpx.AsyncClient] = None
+    
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """
+        Shared async HTTP client, so TCP/TLS connections are reused across requests.
+        """
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=64, max_connections=256),
+                timeout=httpx.Timeout(30, connect=10)
+            )
+        return self._http
+    
+    async def warm_up(self):
+        """
+        Open the Groq connection at startup and check it negotiated HTTP/2, which lets
+        concurrent calls share one connection instead of queueing behind each other.
+        """
+        if not self.groq_api_key:
+            return
+        try:
+            response = await self.http.get(GROQ_MODELS_URL, headers=self._groq_headers, timeout=5)
+        except Exception as e:
+            logger.warning("Groq warm-up failed: %s", e)
+            return
+        if response.http_version == "HTTP/2":
+            logger.info("Groq connection ready (%s)", response.http_version)
+        else:
+            logger.warning("Groq connection negotiated %s; concurrent calls need separate connections", response.http_version)
     
-    def process_text_task(self, task_type: str, text: str, params: dict = None) -> Dict[str, Any]:
+    async def close(self):
+        """
+        Close the shared HTTP client.
+        """
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+    
+    @staticmethod
+    def is_passthrough(task_type: str, text: str, params: dict = None) -> bool:
+        """
+        True if a text task is answered with the input itself, without calling the model:
+        a summarization request for text already within max_length words.
+        """
+        return task_type == "summarization" and _word_count(text) <= (params or {}).get("max_length", 100)
+    
+    async def process_text_task(self, task_type: str, text: str, params: dict = None) -> Dict[str, Any]:
         """
         Process text tasks using Groq API.
         Supports: summarization, sentiment, translation, chat, qa
         """
+        params = params or {}
+        
+        # Only summarization uses the word count; split the text once for prompt and response
+        word_count = _word_count(text) if task_type == "summarization" else 0
+        
+        # Text already within the requested length is its own summary; no model call (or key) needed
+        if self.is_passthrough(task_type, text, params):
+            return self._format_text_response(task_type, text, text, word_count)
+        
         if not self.groq_api_key:
             raise ValueError("GROQ_API_KEY not configured")
         
-        params = params or {}
-        
         # Build prompt based on task type
-        prompt = self._build_text_prompt(task_type, text, params)
+        prompt = self._build_text_prompt(task_type, text, params, word_count)
         
         # Call Groq API
         try:
-            response = self._call_groq_api(prompt, params)
+            response = await self._call_groq_api(prompt, params)
             
             # Format response based on task type
-            output = self._format_text_response(task_type, response, text)
+            output = self._format_text_response(task_type, response, text, word_count)
             return output
             
         except Exception as e:
-            logger.error(f"Groq API error: {e}")
+            logger.error("Groq API error: %s", e)
             raise
     
-    def process_image_task(self, task_type: str, image_source: str, params: dict = None) -> Dict[str, Any]:
+    async def process_image_task(self, task_type: str, image_source: str, params: dict = None) -> Dict[str, Any]:
         """
         Process image tasks using Groq Vision API (Llama 4 Scout).
         Supports: image_classification, image_captioning
@@ -58,23 +157,23 @@ class AIService:
             from app.services.groq_vision_service import classify_image_groq, caption_image_groq
             
             # Download image
-            image_data = self._download_image(image_source)
+            image_data = await self._download_image(image_source)
             
             # Call appropriate Groq vision function
             if task_type == "image_classification":
-                output = classify_image_groq(image_data)
+                output = await classify_image_groq(image_data)
             elif task_type == "image_captioning":
-                output = caption_image_groq(image_data)
+                output = await caption_image_groq(image_data)
             else:
                 raise ValueError(f"Unsupported image task: {task_type}")
             
             return output
             
         except Exception as e:
-            logger.error(f"Groq Vision API error: {e}")
+            logger.error("Groq Vision API error: %s", e)
             raise
     
-    def process_image_bytes(self, task_type: str, image_bytes: bytes, params: dict = None) -> Dict[str, Any]:
+    async def process_image_bytes(self, task_type: str, image_bytes: bytes, params: dict = None) -> Dict[str, Any]:
         """
         Process image tasks using Groq Vision API (Llama 4 Scout) with image bytes directly.
         Supports: image_classification, image_captioning
@@ -90,66 +189,38 @@ class AIService:
             
             # Call appropriate Groq vision function directly with bytes
             if task_type == "image_classification":
-                output = classify_image_groq(image_bytes)
+                output = await classify_image_groq(image_bytes)
             elif task_type == "image_captioning":
-                output = caption_image_groq(image_bytes)
+                output = await caption_image_groq(image_bytes)
             else:
                 raise ValueError(f"Unsupported image task: {task_type}")
             
             return output
             
         except Exception as e:
-            logger.error(f"Groq Vision API error: {e}")
+            logger.error("Groq Vision API error: %s", e)
             raise
     
-    def _build_text_prompt(self, task_type: str, text: str, params: dict) -> str:
+    def _build_text_prompt(self, task_type: str, text: str, params: dict, word_count: int = 0) -> str:
         """
-        Build appropriate prompt for each task type.
+        Build appropriate prompt for each task type from the module-level templates.
         """
-        if task_type == "summarization":
-            max_length = params.get("max_length", 100)
-            return f"""You are a text summarization assistant. Your task is to create a SHORTER, CONDENSED summary.
-
-CRITICAL RULES:
-- The summary MUST be shorter than the original text
-- Maximum length: {max_length} words
-- Be concise and capture only the key points
-- Do not add explanations or extra details
-- Just provide the summary, nothing else
-
-Original text ({len(text.split())} words):
-{text}
-
-Provide a summary in {max_length} words or less:"""
-        
-        elif task_type == "sentiment":
-            return f"Analyze the sentiment of the following text. Respond with only: positive, negative, or neutral.\n\nText: {text}\n\nSentiment:"
-        
-        elif task_type == "translation":
-            target_lang = params.get("target_language", "Spanish")
-            return f"Translate the following text to {target_lang}:\n\n{text}\n\nTranslation:"
-        
-        elif task_type == "chat":
-            return text
-        
-        elif task_type == "qa":
-            context = params.get("context", "")
-            return f"Context: {context}\n\nQuestion: {text}\n\nAnswer:"
-        
-        else:
+        template = TEXT_PROMPT_TEMPLATES.get(task_type)
+        if template is None:
+            # chat and unknown tasks send the text as-is
             return text
+        return template.format_map({
+            "text": text,
+            "word_count": word_count,
+            "max_length": params.get("max_length", 100),
+            "target_language": params.get("target_language", "Spanish"),
+            "context": params.get("context", "")
+        })
     
-    def _call_groq_api(self, prompt: str, params: dict) -> str:
+    async def _call_groq_api(self, prompt: str, params: dict) -> str:
         """
         Call Groq API for text generation.
         """
-        url = "https://api.groq.com/openai/v1/chat/completions"
-        
-        headers = {
-            "Authorization": f"Bearer {self.groq_api_key}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "model": params.get("model", self.groq_model),
             "messages": [{"role": "user", "content": prompt}],
@@ -157,30 +228,66 @@ Provide a summary in {max_length} words or less:"""
             "max_tokens": params.get("max_tokens", 1000)
         }
         
-        response = requests.post(url, json=payload, headers=headers, timeout=30)
+        # Encode/decode with orjson rather than httpx's stdlib json
+        response = await self.http.post(GROQ_CHAT_URL, content=orjson.dumps(payload), headers=self._groq_headers)
         
         # Check for errors and log detailed message
         if response.status_code != 200:
-            error_detail = response.text
-            logger.error(f"Groq API error: {response.status_code} - {error_detail}")
+            logger.error("Groq API error: %s - %s", response.status_code, response.text)
             response.raise_for_status()
         
-        result = response.json()
+        result = orjson.loads(response.content)
         return result["choices"][0]["message"]["content"].strip()
     
-    def _format_text_response(self, task_type: str, response: str, original_text: str) -> Dict[str, Any]:
+    async def stream_text(self, prompt: str, params: dict = None) -> AsyncIterator[str]:
+        """
+        Call Groq API for text generation with streaming, yielding text deltas as they arrive.
+        """
+        if not self.groq_api_key:
+            raise ValueError("GROQ_API_KEY not configured")
+        
+        params = params or {}
+        payload = {
+            "model": params.get("model", self.groq_model),
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": params.get("temperature", 0.7),
+            "max_tokens": params.get("max_tokens", 1000),
+            "stream": True
+        }
+        
+        async with self.http.stream("POST", GROQ_CHAT_URL, content=orjson.dumps(payload), headers=self._groq_headers) as response:
+            if response.status_code != 200:
+                await response.aread()
+                logger.error("Groq API error: %s - %s", response.status_code, response.text)
+                response.raise_for_status()
+            
+            # Server-sent events: one "data: {chunk}" line per delta, then "data: [DONE]"
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                data = line[6:]
+                if data == "[DONE]":
+                    break
+                choices = orjson.loads(data).get("choices")
+                if choices and choices[0].get("delta", {}).get("content"):
+                    yield choices[0]["delta"]["content"]
+    
+    def _format_text_response(self, task_type: str, response: str, original_text: str, word_count: int = None) -> Dict[str, Any]:
         """
         Format API response based on task type.
+        Summarization and sentiment outputs don't echo the input text (or its character length):
+        their cache keys are normalized, so a cached output is shared by differently spaced or
+        cased inputs, and the text routes add those fields from each request instead.
         """
         if task_type == "summarization":
             # Trim response if it's too long (shouldn't happen but just in case)
             response = response.strip()
-            original_word_count = len(original_text.split())
-            summary_word_count = len(response.split())
+            original_word_count = _word_count(original_text) if word_count is None else word_count
+            # A short-circuited summary is the original text, whose count is already known
+            summary_word_count = original_word_count if response == original_text else len(response.split())
             
             return {
                 "summary": response,
-                "original_length": len(original_text),
                 "summary_length": len(response),
                 "original_words": original_word_count,
                 "summary_words": summary_word_count,
@@ -190,27 +297,26 @@ Provide a summary in {max_length} words or less:"""
         elif task_type == "sentiment":
             sentiment = response.lower().strip()
             # Extract first word if response is longer
-            if sentiment not in ["positive", "negative", "neutral"]:
+            if sentiment not in SENTIMENT_LABELS:
                 sentiment = sentiment.split()[0] if sentiment else "neutral"
-            return {"sentiment": sentiment, "text": original_text}
+            return {"sentiment": sentiment}
         
         elif task_type == "translation":
             return {"translated_text": response, "original_text": original_text}
         
-        elif task_type in ["chat", "qa"]:
+        elif task_type in ("chat", "qa"):
             return {"response": response, "input": original_text}
         
         else:
             return {"result": response}
     
-    def _download_image(self, image_source: str) -> bytes:
+    async def _download_image(self, image_source: str) -> bytes:
         """
-        Download image from URL.
+        Download image from URL, streaming it with a size cap.
         """
         if image_source.startswith("http"):
-            response = requests.get(image_source, timeout=15)
-            response.raise_for_status()
-            return response.content
+            image_data, _ = await download_image(self.http, image_source, timeout=15)
+            return image_data
         else:
             raise ValueError("Only HTTP/HTTPS image URLs are supported")
 
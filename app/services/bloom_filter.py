@@ -0,0 +1,38 @@
+"""
+Bloom Filter
+Compact in-process set membership test used to skip cache lookups for keys never cached
+"""
+import math
+
+import xxhash
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over string keys.
+    No false negatives; once capacity is exceeded the false-positive rate rises,
+    which only costs extra cache lookups.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key: str):
+        """
+        Derive bit positions by double hashing a single 128-bit digest.
+        """
+        digest = xxhash.xxh3_128_intdigest(key.encode("utf-8"))
+        h1 = digest & 0xFFFFFFFFFFFFFFFF
+        h2 = (digest >> 64) | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
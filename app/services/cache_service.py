@@ -1,8 +1,16 @@
-import json
-import hashlib
-import redis
-from pymemcache.client.base import Client as MemcacheClient
-from typing import Optional, Tuple, Any
+import asyncio
+import aiomcache
+import xxhash
+import redis.asyncio as redis
+import inspect
+import orjson
+import zstandard
+import random
+import struct
+import time
+from collections import Counter
+from cachetools import LRUCache, TLRUCache
+from typing import Optional, Tuple, Any, Dict, Callable, Set
 import logging
 
 from app.core.config import (
@@ -10,163 +18,789 @@ from app.core.config import (
     MEMCACHE_HOST, 
     MEMCACHE_PORT,
     REDIS_TTL,
-    MEMCACHE_TTL
+    REDIS_MAX_CONNECTIONS,
+    REDIS_STALE_TTL,
+    MEMCACHE_TTL,
+    MEMCACHE_POOL_SIZE,
+    L0_CACHE_MAXSIZE,
+    L0_CACHE_TTL,
+    CACHE_BLOOM_ENABLED,
+    CACHE_BLOOM_CAPACITY,
+    CACHE_BLOOM_ERROR_RATE,
+    CACHE_BLOOM_SYNC_INTERVAL,
+    CACHE_CIRCUIT_COOLDOWN,
+    CACHE_STATS_LOG_INTERVAL,
+    CACHE_ZSTD_DICT_PATH,
+    CACHE_LOCK_TTL
 )
+from app.services.bloom_filter import BloomFilter
 
 logger = logging.getLogger(__name__)
 
+# Frame header that marks a zstd-compressed cache value
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Redis values are prefixed with this marker and a big-endian float "fresh until" timestamp
+# (wall-clock, since other workers and hosts read it); the key itself lives REDIS_STALE_TTL
+# longer so stale entries can be served while refreshing
+SWR_MAGIC = b"SWR1"
+SWR_HEADER = struct.Struct(">4sd")
+
+# Values smaller than this are stored as plain JSON: zstd's frame overhead outweighs
+# any saving on short outputs (e.g. sentiment labels), and reads skip decompression
+ZSTD_MIN_SIZE = 256
+
+# Values at least this large are compressed/decompressed in a worker thread
+ZSTD_OFFLOAD_THRESHOLD = 256 * 1024
+
+# Derived cache keys are memoized for string inputs up to this many characters
+KEY_MEMO_MAXSIZE = 4096
+KEY_MEMO_MAX_INPUT = 4096
+
+
+class _LeaderCancelled(Exception):
+    """
+    Set on a single-flight future when the caller running it is cancelled,
+    so a waiting caller retries the call instead of being cancelled too.
+    """
+
 
 class CacheService:
     """
-    Two-layer caching system:
+    Two-layer caching system, fronted by a small in-process tier:
+    - L0: in-process TTL/LRU of encoded JSON (no network round-trip for hot keys)
     - L1: Memcached (fastest, shortest TTL for very recent requests)
     - L2: Redis (fast, longer TTL for active requests)
     """
     
     def __init__(self):
+        # L0: bounded in-process LRU cache, checked before any network call
+        self._l0 = TLRUCache(maxsize=L0_CACHE_MAXSIZE, ttu=self._l0_expiry)
+        
+        # Same values without expiry, only served while a cache backend is failing
+        self._fallback = LRUCache(maxsize=L0_CACHE_MAXSIZE)
+        
+        # Recently derived cache keys for repeated short inputs (common prompts, heartbeats)
+        self._key_memo = LRUCache(maxsize=KEY_MEMO_MAXSIZE)
+        
+        # Circuit breaker: monotonic time until which each backend is skipped
+        self._circuit_open_until: Dict[str, float] = {"memcached": 0.0, "redis": 0.0}
+        
+        # Values in L1/L2 are orjson-encoded and, above ZSTD_MIN_SIZE, zstd-compressed,
+        # with a shared dictionary if one is configured (LLM outputs share a lot of phrasing)
+        self._zstd_dict = self._load_zstd_dict(CACHE_ZSTD_DICT_PATH)
+        self._compressor = self._new_compressor()
+        self._decompressor = zstandard.ZstdDecompressor(dict_data=self._zstd_dict)
+        
         try:
-            self.redis_client = redis.from_url(REDIS_URL, decode_responses=True, socket_connect_timeout=5)
+            # Shared, bounded pool: callers wait for a free connection instead of opening new ones.
+            # Keepalive and idle health checks catch connections silently dropped by NAT/load
+            # balancers before a request stalls on them.
+            self._redis_pool = redis.BlockingConnectionPool.from_url(
+                REDIS_URL,
+                max_connections=REDIS_MAX_CONNECTIONS,
+                timeout=5,
+                socket_connect_timeout=5,
+                socket_keepalive=True,
+                health_check_interval=30
+            )
+            self.redis_client = redis.Redis(connection_pool=self._redis_pool)
             logger.info("Redis client initialized")
         except Exception as e:
-            logger.error(f"Failed to initialize Redis: {e}")
+            logger.error("Failed to initialize Redis: %s", e)
             self.redis_client = None
         if not self.redis_client:
             logger.warning("Redis client is not available - L2 cache disabled")
         
         try:
-            self.memcached_client = MemcacheClient((MEMCACHE_HOST, MEMCACHE_PORT), connect_timeout=5, timeout=5)
+            # aiomcache only grows its pool up to pool_minsize, so both are set to the pool size
+            self.memcached_client = aiomcache.Client(
+                MEMCACHE_HOST,
+                MEMCACHE_PORT,
+                pool_size=MEMCACHE_POOL_SIZE,
+                pool_minsize=MEMCACHE_POOL_SIZE
+            )
             logger.info("Memcached client initialized")
         except Exception as e:
-            logger.error(f"Failed to initialize Memcached: {e}")
+            logger.error("Failed to initialize Memcached: %s", e)
             self.memcached_client = None
         if not self.memcached_client:
             logger.warning("Memcached client is not available - L1 cache disabled")
+        
+        # In-flight model calls keyed by cache key (single-flight coalescing)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        
+        # Fire-and-forget tasks (lookups that lost the race, L1 promotions)
+        self._background_tasks: Set[asyncio.Task] = set()
+        
+        # Keys known to be cached. Lookups are only skipped once the filter has been
+        # seeded from Redis, and it is resynced periodically to pick up other workers' writes.
+        self._bloom = BloomFilter(CACHE_BLOOM_CAPACITY, CACHE_BLOOM_ERROR_RATE) if CACHE_BLOOM_ENABLED else None
+        self._bloom_ready = False
+        self._bloom_task: Optional[asyncio.Task] = None
+        
+        # Lookup outcomes since the last summary line; per-lookup lines are DEBUG only
+        self.lookup_counts: Counter = Counter()
+        self._stats_task: Optional[asyncio.Task] = None
+    
+    @staticmethod
+    def _l0_expiry(key: str, value: Any, now: float) -> float:
+        """
+        L0 expiry time with up to 10% jitter so hot keys don't all expire together.
+        """
+        return now + L0_CACHE_TTL * (1 + random.random() * 0.1)
     
-    def generate_cache_key(self, task_type: str, input_data: Any, params: dict = None) -> str:
+    def generate_cache_key(self, task_type: str, input_data: Any, params: dict = None, use_memo: bool = True) -> str:
         """
-        Generate a deterministic cache key based on task type, input, and parameters.
+        Generate a deterministic, fixed-length cache key based on task type, input, and parameters.
+        Keys for short string inputs are memoized; pass use_memo=False for one-off inputs
+        such as upload digests.
         """
-        # Create a deterministic string representation
-        key_parts = {
-            "task_type": task_type,
-            "input": input_data,
-            "params": params or {}
-        }
-        key_string = json.dumps(key_parts, sort_keys=True, ensure_ascii=False)
+        # Canonical params encoding, computed once for both the memo lookup and the hash
+        encoded_params = orjson.dumps(params, option=orjson.OPT_SORT_KEYS) if params else b"{}"
+        if not use_memo or not isinstance(input_data, str) or len(input_data) > KEY_MEMO_MAX_INPUT:
+            return self._derive_cache_key(task_type, input_data, encoded_params)
         
-        # Hash for consistent key length
-        key_hash = hashlib.sha256(key_string.encode()).hexdigest()
-        return f"ai_cache:{task_type}:{key_hash[:16]}"
+        memo_key = (task_type, input_data, encoded_params)
+        cache_key = self._key_memo.get(memo_key)
+        if cache_key is None:
+            cache_key = self._key_memo[memo_key] = self._derive_cache_key(task_type, input_data, encoded_params)
+        return cache_key
     
-    def get_from_cache(self, key: str) -> Tuple[Optional[Any], Optional[str]]:
+    @staticmethod
+    def _derive_cache_key(task_type: str, input_data: Any, encoded_params: bytes) -> str:
         """
-        Try to retrieve from L1 (Memcached) first, then L2 (Redis).
-        Returns: (cached_value, cache_source) or (None, None)
+        Hash the canonical encoding of (task type, input, params) into a cache key.
+        encoded_params is the params dict already serialized with sorted keys.
         """
-        # Try L1: Memcached (fastest)
-        if self.memcached_client:
-            try:
-                mc_value = self.memcached_client.get(key)
-                if mc_value:
-                    try:
-                        # Memcached returns bytes
-                        decoded = mc_value.decode('utf-8') if isinstance(mc_value, bytes) else mc_value
-                        result = json.loads(decoded)
-                        logger.info(f"Cache HIT in Memcached for key: {key[:30]}...")
-                        return result, "memcached"
-                    except Exception as e:
-                        logger.warning(f"Failed to decode Memcached value: {e}")
-            except Exception as e:
-                logger.warning(f"Memcached get error: {e}")
+        # 128-bit XXH3 digest: non-cryptographic (keys need no collision resistance
+        # against attackers), SIMD-fast, and short regardless of input size
+        hasher = xxhash.xxh3_128(task_type.encode("utf-8"))
+        if isinstance(input_data, str):
+            # Text (often many KB) is hashed as raw UTF-8, skipping the JSON escaping pass.
+            # The "s"/"j" tags keep text and JSON-encoded inputs from ever sharing a key.
+            hasher.update(b"\0s\0")
+            hasher.update(input_data.encode("utf-8"))
         else:
-            logger.debug("Memcached client not configured, skipping L1 lookup")
-        
-        # Try L2: Redis (still fast)
-        if self.redis_client:
+            hasher.update(b"\0j\0")
+            hasher.update(orjson.dumps(input_data, option=orjson.OPT_SORT_KEYS))
+        hasher.update(b"\0")
+        hasher.update(encoded_params)
+        return f"ai_cache:{task_type}:{hasher.hexdigest()}"
+    
+    @staticmethod
+    def _load_zstd_dict(path: str) -> Optional[zstandard.ZstdCompressionDict]:
+        """
+        Load the configured zstd dictionary, or None to compress without one.
+        """
+        if not path:
+            return None
+        try:
+            with open(path, "rb") as f:
+                zstd_dict = zstandard.ZstdCompressionDict(f.read())
+            logger.info("Loaded zstd dictionary %s (id %s)", path, zstd_dict.dict_id())
+            return zstd_dict
+        except OSError as e:
+            logger.error("Failed to load zstd dictionary %s: %s", path, e)
+            return None
+    
+    def _new_compressor(self) -> zstandard.ZstdCompressor:
+        return zstandard.ZstdCompressor(level=3, dict_data=self._zstd_dict)
+    
+    async def build_compression_dictionary(self, path: str, max_samples: int = 2000, dict_size: int = 16384) -> int:
+        """
+        Train a zstd dictionary from values currently in Redis and write it to path,
+        for use as CACHE_ZSTD_DICT_PATH. Returns the number of samples used.
+        Run it with: python -m app.build_cache_dict <path>
+        """
+        if not self.redis_client:
+            raise RuntimeError("Redis client is not available")
+        samples = []
+        async for key in self.redis_client.scan_iter(match="ai_cache:*", count=1000):
+            raw = await self.redis_client.get(key)
+            if not raw:
+                continue
+            payload, _ = self._unwrap_redis(raw)
             try:
-                redis_value = self.redis_client.get(key)
-                if redis_value:
-                    try:
-                        result = json.loads(redis_value)
-                        logger.info(f"Cache HIT in Redis for key: {key[:30]}...")
-                        
-                        # Promote to L1 for frequent access
-                        self._promote_to_memcached(key, result)
-                        
-                        return result, "redis"
-                    except Exception as e:
-                        logger.warning(f"Failed to decode Redis value: {e}")
-            except Exception as e:
-                logger.warning(f"Redis get error: {e}")
-        else:
+                samples.append(self._decompress(payload))
+            except Exception:
+                continue
+            if len(samples) >= max_samples:
+                break
+        if not samples:
+            raise ValueError("No cached values in Redis to train a dictionary from")
+        zstd_dict = await asyncio.to_thread(zstandard.train_dictionary, dict_size, samples)
+        with open(path, "wb") as f:
+            f.write(zstd_dict.as_bytes())
+        logger.info("Wrote %d-byte zstd dictionary from %d samples to %s", len(zstd_dict.as_bytes()), len(samples), path)
+        return len(samples)
+    
+    def _decompress(self, raw: bytes) -> bytes:
+        """
+        Return the JSON bytes of a stored value, accepting both zstd frames and plain JSON entries.
+        """
+        if raw[:4] == ZSTD_MAGIC:
+            return self._decompressor.decompress(raw)
+        return raw
+    
+    def _circuit_open(self, backend: str) -> bool:
+        """
+        True while a backend is being skipped. Closed circuits are 0.0, so the
+        common healthy path doesn't read the clock at all.
+        """
+        open_until = self._circuit_open_until[backend]
+        if not open_until:
+            return False
+        if time.monotonic() < open_until:
+            return True
+        self._circuit_open_until[backend] = 0.0
+        return False
+    
+    def _trip_circuit(self, backend: str):
+        """
+        Skip a failing backend for CACHE_CIRCUIT_COOLDOWN seconds instead of
+        paying a connect timeout on every request.
+        """
+        self._circuit_open_until[backend] = time.monotonic() + CACHE_CIRCUIT_COOLDOWN
+    
+    @property
+    def degraded(self) -> bool:
+        """
+        True while any cache backend is being skipped after a failure.
+        """
+        return self._circuit_open("memcached") or self._circuit_open("redis")
+    
+    async def _get_memcached(self, key: str) -> Optional[bytes]:
+        """
+        Fetch a raw value from L1 (Memcached).
+        """
+        if not self.memcached_client:
+            logger.debug("Memcached client not configured, skipping L1 lookup")
+            return None
+        if self._circuit_open("memcached"):
+            return None
+        try:
+            return await self.memcached_client.get(key.encode('utf-8'))
+        except Exception as e:
+            logger.warning("Memcached get error: %s", e)
+            self._trip_circuit("memcached")
+        return None
+    
+    async def _get_redis(self, key: str) -> Optional[bytes]:
+        """
+        Fetch a raw value from L2 (Redis).
+        """
+        if not self.redis_client:
             logger.debug("Redis client not configured, skipping L2 lookup")
+            return None
+        if self._circuit_open("redis"):
+            return None
+        try:
+            return await self.redis_client.get(key)
+        except Exception as e:
+            logger.warning("Redis get error: %s", e)
+            self._trip_circuit("redis")
+        return None
+    
+    @staticmethod
+    def _unwrap_redis(raw: bytes) -> Tuple[bytes, bool]:
+        """
+        Split a Redis value into its payload and whether it is past its fresh TTL.
+        Values written without the header are treated as fresh.
+        """
+        if raw[:4] == SWR_MAGIC:
+            _, fresh_until = SWR_HEADER.unpack_from(raw)
+            return raw[SWR_HEADER.size:], time.time() >= fresh_until
+        return raw, False
+    
+    async def get_from_cache(self, key: str,
+                             refresh: Optional[Callable[[], Any]] = None) -> Tuple[Optional[Any], Optional[str]]:
+        """
+        Look up a cached value and decode it.
+        Returns: (cached_value, cache_source) or (None, None)
+        """
+        raw, cache_source = await self.get_raw_from_cache(key, refresh)
+        if raw is None:
+            return None, None
+        try:
+            return orjson.loads(raw), cache_source
+        except Exception as e:
+            logger.warning("Failed to decode %s value: %s", cache_source, e)
+            return None, None
+    
+    async def get_raw_from_cache(self, key: str,
+                                 refresh: Optional[Callable[[], Any]] = None) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        Check L0 (in-process) first, then look up L1 (Memcached) and L2 (Redis)
+        concurrently, returning whichever hits first.
+        Returns the value as encoded JSON bytes, so hits can be forwarded without a decode.
+        A Redis entry past its fresh TTL is a miss, unless refresh is given: then the
+        stale value is served and refresh() recomputes the entry in the background.
+        Returns: (json_bytes, cache_source) or (None, None)
+        """
+        l0_result = self._l0.get(key)
+        if l0_result is not None:
+            self.lookup_counts["memory"] += 1
+            logger.debug("Cache HIT in memory for key: %.30s...", key)
+            return l0_result, "memory"
+        
+        if self._bloom_ready and key not in self._bloom:
+            self.lookup_counts["bloom_miss"] += 1
+            logger.debug("Cache MISS (bloom filter) for key: %.30s...", key)
+            return None, None
+        
+        # Only query backends that are configured and not tripped
+        lookups = []
+        if self.memcached_client and not self._circuit_open("memcached"):
+            lookups.append(("memcached", self._get_memcached))
+        if self.redis_client and not self._circuit_open("redis"):
+            lookups.append(("redis", self._get_redis))
+        
+        hit = None
+        if len(lookups) == 1:
+            # One backend: await it directly, no tasks to schedule
+            source, get = lookups[0]
+            hit = self._accept_hit(source, await get(key), refresh)
+        elif lookups:
+            tasks = {asyncio.create_task(get(key)): source for source, get in lookups}
+            pending = set(tasks)
+            while pending and hit is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    hit = self._accept_hit(tasks[task], task.result(), refresh)
+                    if hit is not None:
+                        break
+            
+            # Let the slower lookup finish on its own; cancelling it mid-read
+            # would force the client to drop the pooled connection
+            for other in pending:
+                self._spawn(other)
+        
+        if hit is not None:
+            source, raw, result, stale = hit
+            if stale:
+                # Serve the stale value now; the refresh repopulates every layer
+                self.lookup_counts["stale"] += 1
+                logger.debug("Cache STALE in redis for key: %.30s..., refreshing", key)
+                self._spawn(self._refresh(key, refresh))
+                return result, source
+            
+            self.lookup_counts[source] += 1
+            logger.debug("Cache HIT in %s for key: %.30s...", source, key)
+            self._l0[key] = result
+            self._fallback[key] = result
+            
+            # Promote Redis hits to L1 without delaying the response
+            if source == "redis":
+                self._spawn(self._promote_to_memcached(key, raw))
+            
+            return result, source
         
-        logger.info(f"Cache MISS for key: {key[:30]}...")
+        # With a backend down, a recent value beats a model call per request
+        if self.degraded:
+            fallback = self._fallback.get(key)
+            if fallback is not None:
+                self.lookup_counts["local_fallback"] += 1
+                logger.warning("Cache degraded, serving local fallback for key: %.30s...", key)
+                return fallback, "local_fallback"
+        
+        self.lookup_counts["miss"] += 1
+        logger.debug("Cache MISS for key: %.30s...", key)
         return None, None
     
-    def set_in_cache(self, key: str, value: Any, 
-                     ttl_redis: int = None, ttl_memcached: int = None):
+    def _accept_hit(self, source: str, raw: Optional[bytes],
+                    refresh: Optional[Callable[[], Any]]) -> Optional[Tuple[str, bytes, bytes, bool]]:
         """
-        Store value in both L1 (Memcached) and L2 (Redis) caches.
+        Turn a raw L1/L2 value into (source, stored_value, json_bytes, stale), or None if it
+        can't be served: empty, undecodable, or stale with no refresh to run.
         """
-        ttl_redis = ttl_redis or REDIS_TTL
-        ttl_memcached = ttl_memcached or MEMCACHE_TTL
+        if not raw:
+            return None
+        stale = False
+        if source == "redis":
+            raw, stale = self._unwrap_redis(raw)
+            if stale and refresh is None:
+                return None
+        try:
+            return source, raw, self._decompress(raw), stale
+        except Exception as e:
+            logger.warning("Failed to decompress %s value: %s", source, e)
+            return None
+    
+    async def set_in_cache(self, key: str, value: Any, 
+                           ttl_redis: int = None, ttl_memcached: int = None):
+        """
+        Store value in L0 (in-process), L1 (Memcached) and L2 (Redis) caches.
+        """
+        encoded = self._set_local(key, value)
+        if encoded is not None:
+            await self._set_remote(key, encoded, ttl_redis, ttl_memcached)
+    
+    def set_in_cache_nowait(self, key: str, value: Any,
+                            ttl_redis: int = None, ttl_memcached: int = None):
+        """
+        Store value in L0 immediately and write L1/L2 in the background,
+        so the caller can respond without waiting on the network.
+        """
+        encoded = self._set_local(key, value)
+        if encoded is not None:
+            self._spawn(self._set_remote(key, encoded, ttl_redis, ttl_memcached))
+    
+    def _set_local(self, key: str, value: Any) -> Optional[bytes]:
+        """
+        Encode value, store it in L0 and the bloom filter, and return the encoded JSON for L1/L2.
+        """
+        try:
+            encoded = orjson.dumps(value)
+        except Exception as e:
+            logger.error("Failed to serialize cache value: %s", e)
+            return None
         
+        self._l0[key] = encoded
+        self._fallback[key] = encoded
+        if self._bloom is not None:
+            self._bloom.add(key)
+        return encoded
+    
+    async def _compress(self, encoded: bytes) -> bytes:
+        """
+        zstd-compress a value (small values are left as-is); large values are compressed in a worker thread
+        (with their own compressor, as one is not safe to share across threads).
+        """
+        if len(encoded) < ZSTD_MIN_SIZE:
+            return encoded
+        if len(encoded) < ZSTD_OFFLOAD_THRESHOLD:
+            return self._compressor.compress(encoded)
+        return await asyncio.to_thread(self._new_compressor().compress, encoded)
+    
+    async def _set_remote(self, key: str, encoded: bytes,
+                          ttl_redis: int = None, ttl_memcached: int = None,
+                          release_lock: Optional[str] = None):
+        """
+        Compress encoded JSON and write it to L1 (Memcached) and L2 (Redis) concurrently.
+        The Redis copy carries its fresh-until time and outlives it by REDIS_STALE_TTL.
+        release_lock is deleted in the same Redis round-trip as the write.
+        """
+        serialized = await self._compress(encoded)
+        ttl_redis = ttl_redis or REDIS_TTL
+        await asyncio.gather(
+            self._set_memcached(key, serialized, ttl_memcached or MEMCACHE_TTL),
+            self._set_redis(key, self._wrap_redis(serialized, ttl_redis), ttl_redis + REDIS_STALE_TTL, release_lock)
+        )
+    
+    @staticmethod
+    def _wrap_redis(serialized: bytes, ttl_redis: int) -> bytes:
+        """
+        Prefix a compressed value with its SWR fresh-until header.
+        """
+        return SWR_HEADER.pack(SWR_MAGIC, time.time() + ttl_redis) + serialized
+    
+    async def _set_memcached(self, key: str, serialized: bytes, ttl: int):
+        """
+        Store a serialized value in L1 (Memcached).
+        """
+        if not self.memcached_client:
+            logger.debug("Memcached client not configured, skipping L1 set")
+            return
+        if self._circuit_open("memcached"):
+            return
         try:
-            serialized = json.dumps(value, ensure_ascii=False)
-            
-            # Store in L1: Memcached
-            if self.memcached_client:
-                try:
-                    self.memcached_client.set(key, serialized.encode('utf-8'), expire=ttl_memcached)
-                    logger.debug(f"Cached in Memcached with TTL {ttl_memcached}s")
-                except Exception as e:
-                    logger.warning(f"Failed to cache in Memcached: {e}")
-            else:
-                logger.debug("Memcached client not configured, skipping L1 set")
-            
-            # Store in L2: Redis
-            if self.redis_client:
-                try:
-                    self.redis_client.setex(key, ttl_redis, serialized)
-                    logger.debug(f"Cached in Redis with TTL {ttl_redis}s")
-                except Exception as e:
-                    logger.warning(f"Failed to cache in Redis: {e}")
+            await self.memcached_client.set(key.encode('utf-8'), serialized, exptime=ttl)
+            logger.debug("Cached in Memcached with TTL %ss", ttl)
+        except Exception as e:
+            logger.warning("Failed to cache in Memcached: %s", e)
+            self._trip_circuit("memcached")
+    
+    async def _set_redis(self, key: str, serialized: bytes, ttl: int, release_lock: Optional[str] = None):
+        """
+        Store a serialized value in L2 (Redis), optionally deleting a compute lock
+        in the same pipeline.
+        """
+        if not self.redis_client:
+            logger.debug("Redis client not configured, skipping L2 set")
+            return
+        if self._circuit_open("redis"):
+            if release_lock:
+                await self._release_lock(release_lock)
+            return
+        try:
+            if release_lock:
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.setex(key, ttl, serialized)
+                pipe.delete(release_lock)
+                await pipe.execute()
             else:
-                logger.debug("Redis client not configured, skipping L2 set")
-                    
+                await self.redis_client.setex(key, ttl, serialized)
+            logger.debug("Cached in Redis with TTL %ss", ttl)
         except Exception as e:
-            logger.error(f"Failed to serialize cache value: {e}")
+            logger.warning("Failed to cache in Redis: %s", e)
+            self._trip_circuit("redis")
     
-    def _promote_to_memcached(self, key: str, value: Any):
+    async def warm_up(self):
+        """
+        Open backend connections at startup. aiomcache fills its whole pool
+        (one connect after another) on first use, which would otherwise land on
+        the first request to reach Memcached.
+        """
+        if self.memcached_client and not self._circuit_open("memcached"):
+            try:
+                await self.memcached_client.version()
+                logger.info("Memcached pool warmed (%s connections)", MEMCACHE_POOL_SIZE)
+            except Exception as e:
+                logger.warning("Memcached warm-up failed: %s", e)
+                self._trip_circuit("memcached")
+        if self.redis_client and not self._circuit_open("redis"):
+            try:
+                await self.redis_client.ping()
+            except Exception as e:
+                logger.warning("Redis warm-up failed: %s", e)
+                self._trip_circuit("redis")
+    
+    def start_bloom_sync(self):
+        """
+        Start the background task that seeds and resyncs the bloom filter from Redis.
+        """
+        if self._bloom is not None and self.redis_client and self._bloom_task is None:
+            self._bloom_task = asyncio.create_task(self._bloom_sync_loop())
+    
+    async def _bloom_sync_loop(self):
+        """
+        Add every cached key in Redis to the bloom filter, then repeat every
+        CACHE_BLOOM_SYNC_INTERVAL seconds.
+        """
+        while True:
+            try:
+                count = 0
+                async for key in self.redis_client.scan_iter(match="ai_cache:*", count=1000):
+                    self._bloom.add(key.decode("utf-8"))
+                    count += 1
+                if not self._bloom_ready:
+                    logger.info("Bloom filter seeded with %s cached keys", count)
+                self._bloom_ready = True
+            except Exception as e:
+                logger.warning("Bloom filter sync failed: %s", e)
+            await asyncio.sleep(CACHE_BLOOM_SYNC_INTERVAL)
+    
+    def start_stats_log(self):
+        """
+        Start the background task that logs lookup counts every CACHE_STATS_LOG_INTERVAL seconds.
+        """
+        if CACHE_STATS_LOG_INTERVAL > 0 and self._stats_task is None:
+            self._stats_task = asyncio.create_task(self._stats_log_loop())
+    
+    async def _stats_log_loop(self):
+        """
+        Log and reset the lookup counts, one line per interval instead of one per lookup.
+        """
+        while True:
+            await asyncio.sleep(CACHE_STATS_LOG_INTERVAL)
+            if self.lookup_counts:
+                counts, self.lookup_counts = self.lookup_counts, Counter()
+                logger.info("Cache lookups in last %ss: %s", CACHE_STATS_LOG_INTERVAL, dict(counts))
+    
+    def _spawn(self, aw):
+        """
+        Run a coroutine or task in the background, keeping a reference until it finishes.
+        """
+        task = asyncio.ensure_future(aw)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def _promote_to_memcached(self, key: str, serialized: bytes):
         """
         Promote frequently accessed Redis items to Memcached for faster access.
         """
         if self.memcached_client:
             try:
-                serialized = json.dumps(value, ensure_ascii=False)
-                self.memcached_client.set(key, serialized.encode('utf-8'), expire=MEMCACHE_TTL)
-                logger.debug(f"Promoted to Memcached: {key[:30]}...")
+                await self.memcached_client.set(key.encode('utf-8'), serialized, exptime=MEMCACHE_TTL)
+                logger.debug("Promoted to Memcached: %.30s...", key)
+            except Exception as e:
+                logger.warning("Failed to promote to Memcached: %s", e)
+    
+    async def single_flight(self, key: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run func(*args, **kwargs) once per key among concurrent callers.
+        Callers arriving while a call for the same key is in flight await its result
+        instead of calling the model again. func may be sync or async.
+        If the leading call is cancelled (e.g. its client disconnected), a waiting
+        caller takes over instead of the others being cancelled with it.
+        """
+        while True:
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            logger.info("Joining in-flight request for key: %.30s...", key)
+            try:
+                return await asyncio.shield(inflight)
+            except _LeaderCancelled:
+                # The first follower to resume finds no in-flight call and becomes the leader
+                continue
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = func(*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # Only this caller was cancelled; hand the key over to a follower
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark as retrieved so an unawaited failure is not reported twice
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+    
+    async def get_json(self, key: str) -> Optional[Any]:
+        """
+        Read a JSON value stored directly in Redis (bypasses the L0/L1 tiers).
+        """
+        raw = await self._get_redis(key)
+        if not raw:
+            return None
+        try:
+            return orjson.loads(raw)
+        except Exception as e:
+            logger.warning("Failed to decode Redis JSON value: %s", e)
+            return None
+    
+    async def set_json(self, key: str, value: Any, ttl: int):
+        """
+        Store a JSON value directly in Redis with the given TTL.
+        """
+        try:
+            serialized = orjson.dumps(value)
+        except Exception as e:
+            logger.error("Failed to serialize JSON value: %s", e)
+            return
+        await self._set_redis(key, serialized, ttl)
+    
+    async def get_or_compute(self, key: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        On a cache miss, compute the value with func(*args, **kwargs) and store it,
+        coalescing concurrent misses so only the first caller computes and writes.
+        """
+        return await self.single_flight(key, self._compute_and_set, key, func, *args, **kwargs)
+    
+    async def _compute_and_set(self, key: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run func (sync or async), store its result in L0 and queue the L1/L2 writes.
+        L0 is populated before the single-flight future resolves, so followers never miss.
+        single_flight only coalesces within this process; a short Redis lock extends that
+        across workers, with lock losers waiting for the winner's Redis write.
+        """
+        lock_key = f"lock:{key}"
+        locked = await self._acquire_lock(lock_key)
+        if not locked:
+            result = await self._wait_for_fresh(key)
+            if result is not None:
+                return result
+        
+        try:
+            result = func(*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+        except BaseException:
+            if locked:
+                # Release before single_flight hands the key over, or the caller
+                # taking over would find the lock held and wait out CACHE_LOCK_TTL
+                await asyncio.shield(self._release_lock(lock_key))
+            raise
+        
+        encoded = self._set_local(key, result)
+        if encoded is not None:
+            # Release the lock only once Redis has the value waiters are polling for
+            self._spawn(self._set_remote(key, encoded, release_lock=lock_key if locked else None))
+        elif locked:
+            self._spawn(self._release_lock(lock_key))
+        return result
+    
+    async def _acquire_lock(self, lock_key: str) -> bool:
+        """
+        Try to take the cross-worker compute lock. Without Redis, every worker computes.
+        """
+        if not self.redis_client or self._circuit_open("redis"):
+            return True
+        try:
+            return bool(await self.redis_client.set(lock_key, b"1", nx=True, ex=CACHE_LOCK_TTL))
+        except Exception as e:
+            logger.warning("Redis lock error: %s", e)
+            self._trip_circuit("redis")
+            return True
+    
+    async def _release_lock(self, lock_key: str):
+        if not self.redis_client:
+            return
+        try:
+            await self.redis_client.delete(lock_key)
+        except Exception as e:
+            logger.warning("Failed to release Redis lock: %s", e)
+    
+    async def _wait_for_fresh(self, key: str) -> Optional[Any]:
+        """
+        Poll Redis with backoff for a fresh value written by the worker holding the lock.
+        Returns None if it does not appear within CACHE_LOCK_TTL.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + CACHE_LOCK_TTL
+        delay = 0.02
+        while loop.time() < deadline:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.25)
+            if self._circuit_open("redis"):
+                return None
+            raw = await self._get_redis(key)
+            if not raw:
+                continue
+            payload, stale = self._unwrap_redis(raw)
+            if stale:
+                continue
+            try:
+                encoded = self._decompress(payload)
+                result = orjson.loads(encoded)
             except Exception as e:
-                logger.warning(f"Failed to promote to Memcached: {e}")
+                logger.warning("Failed to decode redis value: %s", e)
+                return None
+            self._l0[key] = encoded
+            self._fallback[key] = encoded
+            return result
+        return None
+    
+    async def _refresh(self, key: str, func: Callable[[], Any]):
+        """
+        Recompute a stale entry, sharing the single-flight slot with any concurrent miss.
+        """
+        try:
+            await self.get_or_compute(key, func)
+        except Exception as e:
+            logger.warning("Stale refresh failed for key %.30s...: %s", key, e)
     
-    def invalidate_cache(self, key: str):
+    async def invalidate_cache(self, key: str):
         """
-        Remove a key from both cache layers.
+        Remove a key from all cache layers.
         """
+        self._l0.pop(key, None)
+        self._fallback.pop(key, None)
+        
         if self.memcached_client:
             try:
-                self.memcached_client.delete(key)
+                await self.memcached_client.delete(key.encode('utf-8'))
             except Exception as e:
-                logger.warning(f"Failed to delete from Memcached: {e}")
+                logger.warning("Failed to delete from Memcached: %s", e)
         
         if self.redis_client:
             try:
-                self.redis_client.delete(key)
+                await self.redis_client.delete(key)
             except Exception as e:
-                logger.warning(f"Failed to delete from Redis: {e}")
+                logger.warning("Failed to delete from Redis: %s", e)
     
-    def health_check(self) -> Tuple[bool, bool]:
+    async def health_check(self) -> Tuple[bool, bool]:
         """
         Check if Redis and Memcached are connected.
         Returns: (redis_ok, memcached_ok)
@@ -176,19 +810,37 @@ class CacheService:
         
         if self.redis_client:
             try:
-                self.redis_client.ping()
+                await self.redis_client.ping()
                 redis_ok = True
             except Exception as e:
-                logger.error(f"Redis health check failed: {e}")
+                logger.error("Redis health check failed: %s", e)
         
         if self.memcached_client:
             try:
-                self.memcached_client.set("health_check", b"ok", expire=10)
-                memcached_ok = self.memcached_client.get("health_check") == b"ok"
+                await self.memcached_client.set(b"health_check", b"ok", exptime=10)
+                memcached_ok = await self.memcached_client.get(b"health_check") == b"ok"
             except Exception as e:
-                logger.error(f"Memcached health check failed: {e}")
+                logger.error("Memcached health check failed: %s", e)
         
         return redis_ok, memcached_ok
+    
+    async def close(self):
+        """
+        Close cache client connections.
+        """
+        if self._bloom_task:
+            self._bloom_task.cancel()
+            self._bloom_task = None
+        if self._stats_task:
+            self._stats_task.cancel()
+            self._stats_task = None
+        if self._background_tasks:
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        if self.redis_client:
+            await self.redis_client.aclose()
+            await self._redis_pool.disconnect()
+        if self.memcached_client:
+            await self.memcached_client.close()
 
 
 # Global cache service instance
@@ -1,14 +1,90 @@
+import asyncio
 import logging
+import orjson
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy import select, func
-from typing import Optional, Dict, Any
-from datetime import datetime, timedelta
+from sqlalchemy.pool import NullPool
+from sqlalchemy import bindparam, event, select, func, insert, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Optional, Dict, Any, List
+from datetime import datetime, timedelta, timezone
 
-from app.core.config import DATABASE_URL
-from app.models import Base, RequestLog
+from app.core.config import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_USE_PGBOUNCER,
+    LOG_BATCH_SIZE,
+    LOG_FLUSH_INTERVAL_MS,
+    LOG_QUEUE_MAX_SIZE
+)
+from app.models import Base, RequestLog, RequestStatsDaily
 
 logger = logging.getLogger(__name__)
 
+# Built once and reused so SQLAlchemy's compiled cache and asyncpg's prepared
+# statement cache both hit on every batch flush
+INSERT_REQUEST_LOG = insert(RequestLog)
+
+# Adds per-batch deltas onto the daily rollup rows
+_stats_insert = pg_insert(RequestStatsDaily)
+UPSERT_REQUEST_STATS = _stats_insert.on_conflict_do_update(
+    index_elements=[RequestStatsDaily.day, RequestStatsDaily.task_type],
+    set_={
+        "total": RequestStatsDaily.total + _stats_insert.excluded.total,
+        "hits": RequestStatsDaily.hits + _stats_insert.excluded.hits,
+        "memcached_hits": RequestStatsDaily.memcached_hits + _stats_insert.excluded.memcached_hits,
+        "redis_hits": RequestStatsDaily.redis_hits + _stats_insert.excluded.redis_hits,
+        "sum_response_ms": RequestStatsDaily.sum_response_ms + _stats_insert.excluded.sum_response_ms,
+    }
+)
+
+# Advisory lock serializing schema creation and the rollup backfill across workers
+SCHEMA_INIT_LOCK_ID = 0x5e7a11
+
+# request_logs indexes dropped from the model; each one cost every INSERT without serving a query
+RETIRED_INDEXES = (
+    "ix_request_logs_task_type",  # covered by idx_task_operation
+    "ix_request_logs_cache_used",
+    "ix_request_logs_created_at",  # replaced by ix_logs_created_at_brin
+    "idx_cache_performance",
+)
+
+# Statistics over the daily rollup since :cutoff_day, built once so repeat calls
+# hit SQLAlchemy's compiled cache. At most days * task types rows, independent of log volume.
+STATS_QUERY = select(
+    func.coalesce(func.sum(RequestStatsDaily.total), 0),
+    func.coalesce(func.sum(RequestStatsDaily.hits), 0),
+    func.coalesce(func.sum(RequestStatsDaily.memcached_hits), 0),
+    func.coalesce(func.sum(RequestStatsDaily.redis_hits), 0),
+    func.coalesce(func.sum(RequestStatsDaily.sum_response_ms), 0)
+).where(RequestStatsDaily.day >= bindparam("cutoff_day"))
+
+# asyncpg's binary JSONB format is a version byte followed by the JSON text
+JSONB_VERSION = b"\x01"
+
+
+def _register_jsonb_codec(dbapi_connection, connection_record):
+    """
+    Let JSONB parameters go from orjson's bytes straight onto the wire. SQLAlchemy's
+    default codec expects str, costing a decode and a re-encode of every logged payload.
+    As with the default codec, values are deserialized here rather than by the column type.
+    """
+    dbapi_connection.run_async(
+        lambda conn: conn.set_type_codec(
+            "jsonb",
+            schema="pg_catalog",
+            format="binary",
+            encoder=lambda value: JSONB_VERSION + value,
+            decoder=lambda value: orjson.loads(value[1:])
+        )
+    )
+
+
+# Queue sentinel telling the log flusher to finish its batch and exit
+_STOP_FLUSHER = object()
+
 
 class DatabaseService:
     """
@@ -16,14 +92,34 @@ class DatabaseService:
     """
     
     def __init__(self):
-        # Create async engine
+        if DB_USE_PGBOUNCER:
+            # PgBouncer already pools server connections, and in transaction mode a
+            # prepared statement may not exist on the next transaction's backend
+            pool_args = {"poolclass": NullPool}
+            connect_args = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        else:
+            pool_args = {
+                "pool_pre_ping": True,
+                "pool_size": DB_POOL_SIZE,
+                "max_overflow": DB_MAX_OVERFLOW,
+                "pool_timeout": DB_POOL_TIMEOUT,
+                "pool_recycle": DB_POOL_RECYCLE
+            }
+            # asyncpg keeps prepared statements per connection, so the log INSERT is parsed/planned once
+            connect_args = {"prepared_statement_cache_size": 500}
+        
+        # Create async engine with a persistent asyncpg connection pool (or none behind PgBouncer)
         self.engine = create_async_engine(
             DATABASE_URL,
             echo=False,
-            pool_pre_ping=True,
-            pool_size=10,
-            max_overflow=20
+            # Encode/decode JSONB columns with orjson instead of stdlib json (as bytes, see below)
+            json_serializer=orjson.dumps,
+            json_deserializer=orjson.loads,
+            connect_args=connect_args,
+            **pool_args
         )
+        # Runs after the dialect's own codec setup on each new connection
+        event.listen(self.engine.sync_engine, "connect", _register_jsonb_codec)
         
         # Create async session factory
         self.async_session = async_sessionmaker(
@@ -31,6 +127,10 @@ class DatabaseService:
             class_=AsyncSession,
             expire_on_commit=False
         )
+        
+        # Buffered request logs, flushed in batches by a background task
+        self._log_queue: asyncio.Queue = asyncio.Queue(maxsize=LOG_QUEUE_MAX_SIZE)
+        self._flush_task: Optional[asyncio.Task] = None
     
     async def init_db(self):
         """
@@ -38,101 +138,181 @@ class DatabaseService:
         """
         try:
             async with self.engine.begin() as conn:
+                # Held until commit, so a second worker sees the seeded rollup and skips the backfill
+                await conn.execute(select(func.pg_advisory_xact_lock(SCHEMA_INIT_LOCK_ID)))
                 await conn.run_sync(Base.metadata.create_all)
+                # create_all never drops indexes, so remove the ones earlier schemas created
+                for index_name in RETIRED_INDEXES:
+                    await conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+                await self._backfill_stats(conn)
             logger.info("Database tables initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize database: {e}")
             raise
     
-    async def log_request(
-        self,
-        task_type: str,
-        operation: Optional[str],
-        model_name: str,
-        input_json: Dict[str, Any],
-        output_json: Dict[str, Any],
-        cache_used: bool,
-        cache_source: Optional[str],
-        cache_key: Optional[str],
-        response_time_ms: float
-    ) -> int:
-        """
-        Log a request/response to the database.
-        Returns the log ID.
+    async def warm_pool(self):
         """
-        async with self.async_session() as session:
-            try:
-                log = RequestLog(
-                    task_type=task_type,
-                    operation=operation,
-                    model_name=model_name,
-                    input_json=input_json,
-                    output_json=output_json,
-                    cache_used=cache_used,
-                    cache_source=cache_source,
-                    cache_key=cache_key,
-                    response_time_ms=response_time_ms
-                )
-                
-                session.add(log)
-                await session.commit()
-                await session.refresh(log)
-                
-                logger.debug(f"Logged request {log.id} to database")
-                return log.id
-                
-            except Exception as e:
-                await session.rollback()
-                logger.error(f"Failed to log request to database: {e}")
-                raise
+        Open DB_POOL_SIZE connections concurrently and return them to the pool, so the
+        first requests after boot don't each pay for TCP, TLS and authentication.
+        """
+        if DB_USE_PGBOUNCER:
+            return
+        
+        async def open_one():
+            async with self.engine.connect() as conn:
+                await conn.execute(select(1))
+        
+        results = await asyncio.gather(*(open_one() for _ in range(DB_POOL_SIZE)), return_exceptions=True)
+        failed = sum(isinstance(r, Exception) for r in results)
+        if failed:
+            logger.warning("Database pool warm-up: %d of %d connections failed", failed, DB_POOL_SIZE)
+        else:
+            logger.info("Database pool warmed (%d connections)", DB_POOL_SIZE)
+    
+    async def _backfill_stats(self, conn):
+        """
+        Seed the daily rollup from existing request logs the first time it is created.
+        """
+        has_stats = await conn.execute(select(RequestStatsDaily.day).limit(1))
+        if has_stats.first() is not None:
+            return
+        
+        day = func.date(func.timezone("UTC", RequestLog.created_at))
+        source = select(
+            day,
+            RequestLog.task_type,
+            func.count(),
+            func.count().filter(RequestLog.cache_used == True),
+            func.count().filter(RequestLog.cache_source == "memcached"),
+            func.count().filter(RequestLog.cache_source == "redis"),
+            func.coalesce(func.sum(RequestLog.response_time_ms), 0)
+        ).group_by(day, RequestLog.task_type)
+        
+        await conn.execute(
+            insert(RequestStatsDaily).from_select(
+                ["day", "task_type", "total", "hits", "memcached_hits", "redis_hits", "sum_response_ms"],
+                source
+            )
+        )
+    
+    @staticmethod
+    def _aggregate_stats(logs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Collapse a batch of logs into one rollup delta per task type for today (UTC).
+        """
+        day = datetime.now(timezone.utc).date()
+        deltas: Dict[str, Dict[str, Any]] = {}
+        for log in logs:
+            task_type = log["task_type"]
+            delta = deltas.get(task_type)
+            if delta is None:
+                delta = deltas[task_type] = {
+                    "day": day,
+                    "task_type": task_type,
+                    "total": 0,
+                    "hits": 0,
+                    "memcached_hits": 0,
+                    "redis_hits": 0,
+                    "sum_response_ms": 0.0
+                }
+            delta["total"] += 1
+            if log.get("cache_used"):
+                delta["hits"] += 1
+            source = log.get("cache_source")
+            if source == "memcached":
+                delta["memcached_hits"] += 1
+            elif source == "redis":
+                delta["redis_hits"] += 1
+            delta["sum_response_ms"] += log.get("response_time_ms") or 0.0
+        return list(deltas.values())
+    
+    def enqueue_log(self, **kwargs):
+        """
+        Buffer a request log for the background flusher without blocking, dropping it
+        if the queue is full. Takes the RequestLog column values as keyword arguments:
+        task_type, operation, model_name, input_json, output_json, cache_used,
+        cache_source, cache_key and response_time_ms.
+        """
+        try:
+            self._log_queue.put_nowait(kwargs)
+        except asyncio.QueueFull:
+            logger.warning("Request log queue is full, dropping log entry")
+    
+    def start_log_flusher(self):
+        """
+        Start the background task that batches buffered logs into the database.
+        """
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+    
+    async def _flush_loop(self):
+        """
+        Wait for logs, collect up to LOG_BATCH_SIZE rows or LOG_FLUSH_INTERVAL_MS,
+        then write them in a single executemany INSERT.
+        Exits after writing the current batch once the stop sentinel is received.
+        """
+        loop = asyncio.get_running_loop()
+        interval = LOG_FLUSH_INTERVAL_MS / 1000
+        
+        while True:
+            item = await self._log_queue.get()
+            if item is _STOP_FLUSHER:
+                return
+            batch = [item]
+            deadline = loop.time() + interval
+            stopping = False
+            
+            while len(batch) < LOG_BATCH_SIZE:
+                # Take whatever is already queued without a timer; only wait when empty
+                try:
+                    item = self._log_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._log_queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP_FLUSHER:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            await self._write_batch(batch)
+            if stopping:
+                return
+    
+    async def _write_batch(self, batch: List[Dict[str, Any]]):
+        """
+        Insert a batch of request logs and fold it into the daily rollup
+        in the same transaction.
+        """
+        # Core executemany on a bare connection: no ORM bulk-insert bookkeeping and
+        # no RETURNING, since nothing reads the new rows back
+        try:
+            async with self.engine.begin() as conn:
+                await conn.execute(INSERT_REQUEST_LOG, batch)
+                await conn.execute(UPSERT_REQUEST_STATS, self._aggregate_stats(batch))
+            logger.debug(f"Flushed {len(batch)} request logs to database")
+        except Exception as e:
+            logger.error(f"Failed to flush {len(batch)} request logs to database: {e}")
     
     async def get_statistics(self, days: int = 7) -> Dict[str, Any]:
         """
-        Get cache statistics for the last N days.
+        Get cache statistics for the last N days from the daily rollup.
+        Keys match the CacheStatistics schema fields.
         """
         async with self.async_session() as session:
             try:
-                cutoff_date = datetime.utcnow() - timedelta(days=days)
+                cutoff_day = (datetime.now(timezone.utc) - timedelta(days=days)).date()
+                stats_result = await session.execute(STATS_QUERY, {"cutoff_day": cutoff_day})
+                total_requests, cache_hits, memcached_hits, redis_hits, sum_response_ms = stats_result.one()
+                total_requests = int(total_requests)
+                cache_hits = int(cache_hits)
                 
-                # Total requests
-                total_query = select(func.count(RequestLog.id)).where(
-                    RequestLog.created_at >= cutoff_date
-                )
-                total_result = await session.execute(total_query)
-                total_requests = total_result.scalar() or 0
-                
-                # Cache hits
-                cache_query = select(func.count(RequestLog.id)).where(
-                    RequestLog.created_at >= cutoff_date,
-                    RequestLog.cache_used == True
-                )
-                cache_result = await session.execute(cache_query)
-                cache_hits = cache_result.scalar() or 0
-                
-                # Memcached hits
-                memcached_query = select(func.count(RequestLog.id)).where(
-                    RequestLog.created_at >= cutoff_date,
-                    RequestLog.cache_source == "memcached"
-                )
-                memcached_result = await session.execute(memcached_query)
-                memcached_hits = memcached_result.scalar() or 0
-                
-                # Redis hits
-                redis_query = select(func.count(RequestLog.id)).where(
-                    RequestLog.created_at >= cutoff_date,
-                    RequestLog.cache_source == "redis"
-                )
-                redis_result = await session.execute(redis_query)
-                redis_hits = redis_result.scalar() or 0
-                
-                # Average response time
-                avg_time_query = select(func.avg(RequestLog.response_time_ms)).where(
-                    RequestLog.created_at >= cutoff_date
-                )
-                avg_time_result = await session.execute(avg_time_query)
-                avg_response_time = float(avg_time_result.scalar() or 0)
-                
-                # Calculate cache hit rate
+                # Average response time and cache hit rate
+                avg_response_time = (float(sum_response_ms) / total_requests) if total_requests > 0 else 0
                 cache_hit_rate = (cache_hits / total_requests * 100) if total_requests > 0 else 0
                 cache_misses = total_requests - cache_hits
                 
@@ -140,11 +320,11 @@ class DatabaseService:
                     "total_requests": total_requests,
                     "cache_hits": cache_hits,
                     "cache_misses": cache_misses,
-                    "memcached_hits": memcached_hits,
-                    "redis_hits": redis_hits,
+                    "memcached_hits": int(memcached_hits),
+                    "redis_hits": int(redis_hits),
                     "average_response_time_ms": round(avg_response_time, 2),
                     "cache_hit_rate": round(cache_hit_rate, 2),
-                    "time_period_days": days
+                    "time_period": f"last_{days}_days"
                 }
                 
             except Exception as e:
@@ -167,6 +347,19 @@ class DatabaseService:
         """
         Close database connections.
         """
+        if self._flush_task:
+            # Let the flusher write its in-progress batch before exiting
+            await self._log_queue.put(_STOP_FLUSHER)
+            await self._flush_task
+            self._flush_task = None
+        
+        # Write out anything still buffered
+        remaining = []
+        while not self._log_queue.empty():
+            remaining.append(self._log_queue.get_nowait())
+        if remaining:
+            await self._write_batch(remaining)
+        
         await self.engine.dispose()
         logger.info("Database connections closed")
 
@@ -3,21 +3,135 @@ Groq Vision Service
 Uses Groq's Llama 4 vision models for image processing (classification and captioning)
 No PyTorch dependencies needed!
 """
-from groq import Groq
-from typing import Dict, Any
+from groq import AsyncGroq
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Any, List
+import asyncio
 import logging
 import base64
-from app.core.config import GROQ_API_KEY
+import re
+from app.core.config import GROQ_API_KEY, IMAGE_CONCURRENCY
 
 logger = logging.getLogger(__name__)
 
-# Initialize Groq client
-client = Groq(api_key=GROQ_API_KEY)
+# Initialize async Groq client once; the SDK retries 429/5xx with exponential backoff
+client = AsyncGroq(api_key=GROQ_API_KEY, max_retries=3)
 
 # Use Llama 4 Scout (current model as of Nov 2025)
 VISION_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
 
-def classify_image_groq(image_data: bytes) -> Dict[str, Any]:
+# Bound concurrent vision calls so a burst of image jobs queues instead of
+# crowding text requests out of the event loop and the outbound connection pool
+_image_slots = asyncio.Semaphore(IMAGE_CONCURRENCY)
+
+# Base64-encoding multi-megabyte images is CPU work; keep it off the event loop
+_encode_pool = ThreadPoolExecutor(max_workers=IMAGE_CONCURRENCY, thread_name_prefix="image-encode")
+
+DATA_URL_PREFIX = b"data:image/jpeg;base64,"
+
+CLASSIFY_PROMPT = "Classify this image. Provide the top 5 most likely categories with confidence scores. Format as: category: score (e.g., 'cat: 0.95')"
+CAPTION_PROMPT = "Describe this image in one clear, concise sentence."
+
+# "label: score" lines, optionally bulleted ("-" / "*" / "•") or numbered ("1." / "1)"),
+# with markdown emphasis around the label or score ("**cat:** 0.9", "**cat**: 0.9");
+# the score is a fraction or a percentage, optionally followed by a parenthesized note
+_PREDICTION_RE = re.compile(
+    r"^[ \t]*(?:[-*•][ \t]+|\d+[.)][ \t]*)?([^:\n]+?)[ \t]*:[*_ \t]*"
+    r"(\d*\.?\d+)[ \t]*(%)?[*_]*[ \t]*(?:\([^\n]*\))?[ \t]*$",
+    re.M
+)
+
+
+def _parse_predictions(result_text: str, limit: int = 5) -> List[Dict[str, Any]]:
+    """
+    Extract up to limit {"label", "score"} predictions from the model's text, with scores in [0, 1].
+    Percentages (or bare numbers above 1) are scaled down. Only lines with a numeric score count,
+    so headers and prose such as "Confidence: high" are skipped.
+    """
+    predictions = []
+    for label, score, percent in _PREDICTION_RE.findall(result_text):
+        label = label.strip("*_ \t")
+        if not label:
+            continue
+        value = float(score)
+        if percent or value > 1:
+            value /= 100
+        predictions.append({"label": label, "score": min(max(value, 0.0), 1.0)})
+        if len(predictions) == limit:
+            break
+    return predictions
+
+
+def _encode_data_url(image_data: bytes) -> str:
+    """
+    Build the base64 data URL as ASCII bytes and decode once, so the multi-MB
+    string is only materialized as str a single time.
+    """
+    return (DATA_URL_PREFIX + base64.b64encode(image_data)).decode("ascii")
+
+
+async def _to_data_url(image_data: bytes) -> str:
+    """
+    Encode image bytes as a base64 data URL in the image worker pool.
+    """
+    return await asyncio.get_running_loop().run_in_executor(_encode_pool, _encode_data_url, image_data)
+
+
+def _vision_messages(prompt: str, image_url: str) -> list:
+    """
+    Single-turn user message pairing a text prompt with an image.
+    """
+    return [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": {"url": image_url}}
+            ]
+        }
+    ]
+
+
+async def _groq_vision(prompt: str, image_data: bytes, temperature: float, max_tokens: int) -> str:
+    """
+    Send one image with a prompt to the vision model and return the reply text.
+    """
+    async with _image_slots:
+        image_url = await _to_data_url(image_data)
+        response = await client.chat.completions.create(
+            model=VISION_MODEL,
+            messages=_vision_messages(prompt, image_url),
+            temperature=temperature,
+            max_completion_tokens=max_tokens
+        )
+    return response.choices[0].message.content
+
+
+async def stream_caption_groq(image_data: bytes) -> AsyncIterator[str]:
+    """
+    Generate a caption, yielding text pieces as the model produces them
+    
+    Args:
+        image_data: Raw image bytes
+        
+    Yields:
+        Caption text deltas, in order
+    """
+    async with _image_slots:
+        image_url = await _to_data_url(image_data)
+        stream = await client.chat.completions.create(
+            model=VISION_MODEL,
+            messages=_vision_messages(CAPTION_PROMPT, image_url),
+            temperature=0.5,
+            max_completion_tokens=100,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+async def classify_image_groq(image_data: bytes) -> Dict[str, Any]:
     """
     Classify image using Groq's vision model
     
@@ -28,53 +142,10 @@ def classify_image_groq(image_data: bytes) -> Dict[str, Any]:
         Dict containing classification results
     """
     try:
-        # Convert image to base64
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
-        
-        # Call Groq vision model (Llama 4 Scout)
-        response = client.chat.completions.create(
-            model=VISION_MODEL,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "Classify this image. Provide the top 5 most likely categories with confidence scores. Format as: category: score (e.g., 'cat: 0.95')"
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_base64}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            temperature=0.1,
-            max_completion_tokens=300
-        )
+        result_text = await _groq_vision(CLASSIFY_PROMPT, image_data, temperature=0.1, max_tokens=300)
         
-        # Parse response
-        result_text = response.choices[0].message.content
-        
-        # Extract predictions from text
-        predictions = []
-        lines = result_text.strip().split('\n')
-        for line in lines[:5]:  # Top 5
-            line = line.strip()
-            if ':' in line:
-                # Remove numbering like "1.", "2.", etc.
-                line = line.split('.', 1)[-1].strip()
-                parts = line.split(':')
-                if len(parts) >= 2:
-                    label = parts[0].strip()
-                    try:
-                        score_text = parts[1].strip().split()[0]  # Get first number
-                        score = float(score_text)
-                    except:
-                        score = 0.5  # Default score if parsing fails
-                    predictions.append({"label": label, "score": score})
+        # Extract the top 5 predictions from text in one scan
+        predictions = _parse_predictions(result_text)
         
         # If parsing failed, return raw text
         if not predictions:
@@ -90,7 +161,7 @@ def classify_image_groq(image_data: bytes) -> Dict[str, Any]:
         raise Exception(f"Image classification failed: {str(e)}")
 
 
-def caption_image_groq(image_data: bytes) -> Dict[str, Any]:
+async def caption_image_groq(image_data: bytes) -> Dict[str, Any]:
     """
     Generate caption for image using Groq's vision model
     
@@ -101,35 +172,7 @@ def caption_image_groq(image_data: bytes) -> Dict[str, Any]:
         Dict containing caption
     """
     try:
-        # Convert image to base64
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
-        
-        # Call Groq vision model (Llama 4 Scout)
-        response = client.chat.completions.create(
-            model=VISION_MODEL,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "Describe this image in one clear, concise sentence."
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_base64}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            temperature=0.5,
-            max_completion_tokens=100
-        )
-        
-        # Get caption from response
-        caption = response.choices[0].message.content.strip()
+        caption = (await _groq_vision(CAPTION_PROMPT, image_data, temperature=0.5, max_tokens=100)).strip()
         
         return {
             "caption": caption,
@@ -0,0 +1,39 @@
+"""
+Image Download
+Streams remote images with a size cap, so oversized URLs are rejected without buffering them
+"""
+from typing import Any, Optional, Tuple
+
+import httpx
+
+from app.core.config import MAX_IMAGE_BYTES
+
+DOWNLOAD_CHUNK_SIZE = 65536
+
+
+class ImageTooLargeError(ValueError):
+    """
+    Raised when a remote image exceeds MAX_IMAGE_BYTES.
+    """
+
+
+async def download_image(client: httpx.AsyncClient, url: str, **request_kwargs: Any) -> Tuple[bytearray, Optional[str]]:
+    """
+    Download an image, aborting as soon as it is known to exceed MAX_IMAGE_BYTES:
+    from Content-Length before any body is read, otherwise while streaming.
+
+    Returns:
+        Tuple of (image bytes, ETag header or None)
+    """
+    async with client.stream("GET", url, **request_kwargs) as response:
+        response.raise_for_status()
+        content_length = response.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > MAX_IMAGE_BYTES:
+            raise ImageTooLargeError(f"Image is larger than {MAX_IMAGE_BYTES} bytes")
+
+        buf = bytearray()
+        async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+            buf += chunk
+            if len(buf) > MAX_IMAGE_BYTES:
+                raise ImageTooLargeError(f"Image is larger than {MAX_IMAGE_BYTES} bytes")
+        return buf, response.headers.get("etag")
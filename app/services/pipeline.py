@@ -0,0 +1,197 @@
+"""
+Cached Task Pipeline
+Shared cache lookup -> single-flight model call -> cache write -> log flow for API routes
+"""
+import re
+import time
+import logging
+import unicodedata
+import orjson
+from fastapi import Response
+from typing import Any, Callable, Dict, NamedTuple, Optional, Union
+
+from app.core.config import LOG_HIT_OUTPUTS
+from app.services.cache_service import cache_service
+from app.services.db_service import db_service
+from app.services.semantic_cache import semantic_cache
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str, casefold: bool = False) -> str:
+    """
+    Canonical form of input text for cache keys: trimmed, whitespace collapsed, NFC-normalized,
+    and optionally casefolded. The original text is still what the model sees.
+    """
+    normalized = unicodedata.normalize("NFC", _WHITESPACE_RE.sub(" ", text.strip()))
+    return normalized.casefold() if casefold else normalized
+
+
+class TaskResult(NamedTuple):
+    """
+    Outcome of a cached task, ready for a route to shape into its response.
+    output is encoded JSON bytes for cache hits requested with raw=True.
+    """
+    output: Union[Dict[str, Any], bytes]
+    cache_source: str
+    cache_key: str
+    model_name: str
+    response_time_ms: float
+
+    @property
+    def cache_hit(self) -> bool:
+        return self.cache_source != "model"
+
+
+async def handle_cached_task(
+    task_type: str,
+    operation: Optional[str],
+    input_payload: Dict[str, Any],
+    params: Optional[Dict[str, Any]],
+    compute: Callable[[], Any],
+    cache_input: Any = None,
+    model_name: Optional[str] = None,
+    raw: bool = False,
+    stale_while_revalidate: bool = False,
+    returns_source: bool = False,
+    start_time: Optional[int] = None,
+    use_memo: bool = True,
+    semantic: bool = False
+) -> TaskResult:
+    """
+    Serve a task from cache, or run compute() once per key on a miss and cache its output.
+    The request is logged either way.
+
+    Args:
+        task_type: Task name, used in the cache key and the request log
+        operation: Operation name for the request log
+        input_payload: Request input as stored in the request log
+        params: Task parameters that are part of the cache key
+        compute: Zero-argument callable (sync or async) that calls the model
+        cache_input: Input the cache key is derived from (defaults to input_payload)
+        model_name: Model name for the log; falls back to the output's "model" field
+        raw: Return cache hits as the stored JSON bytes instead of decoding them
+        stale_while_revalidate: Serve expired Redis entries while compute() refreshes them
+        returns_source: compute() returns (output, cache_source), for computations that
+            may themselves be served from another cache entry
+        start_time: Request start from time.perf_counter_ns(), if timing began earlier
+        use_memo: Memoize the derived cache key; disable for inputs unlikely to repeat
+        semantic: On an exact miss, serve the cached answer to a near-duplicate text
+            cache_input (when SEMANTIC_CACHE_ENABLED)
+    """
+    if start_time is None:
+        start_time = time.perf_counter_ns()
+
+    cache_key = cache_service.generate_cache_key(
+        task_type,
+        input_payload if cache_input is None else cache_input,
+        params,
+        use_memo=use_memo
+    )
+
+    refresh = compute if stale_while_revalidate else None
+    if raw:
+        output, cache_source = await cache_service.get_raw_from_cache(cache_key, refresh)
+    else:
+        output, cache_source = await cache_service.get_from_cache(cache_key, refresh)
+    semantic_text = cache_input if semantic and semantic_cache and isinstance(cache_input, str) else None
+    if not output and semantic_text is not None:
+        similar_key = semantic_cache.lookup(task_type, params, semantic_text)
+        if similar_key:
+            if raw:
+                output, _ = await cache_service.get_raw_from_cache(similar_key)
+            else:
+                output, _ = await cache_service.get_from_cache(similar_key)
+            if output:
+                cache_source = "semantic"
+    if not output:
+        logger.debug("Cache miss for task: %s", task_type)
+        if returns_source:
+            output, cache_source = await cache_service.single_flight(cache_key, compute)
+            cache_service.set_in_cache_nowait(cache_key, output)
+        else:
+            output = await cache_service.get_or_compute(cache_key, compute)
+            cache_source = "model"
+        if semantic_text is not None:
+            semantic_cache.add(task_type, params, semantic_text, cache_key)
+
+    response_time_ms = (time.perf_counter_ns() - start_time) / 1_000_000
+    if not model_name:
+        decoded = orjson.loads(output) if isinstance(output, bytes) else output
+        model_name = decoded.get("model", "default")
+
+    # A hit's output is the one already logged by the model call for this cache_key,
+    # so by default only model calls pay to encode and store it
+    cache_used = cache_source != "model"
+    if cache_used and not LOG_HIT_OUTPUTS:
+        output_json = {}
+    else:
+        # Fragment embeds already-encoded JSON as-is when the log row is serialized
+        output_json = orjson.Fragment(output) if isinstance(output, bytes) else output
+
+    db_service.enqueue_log(
+        task_type=task_type,
+        operation=operation,
+        model_name=model_name,
+        input_json=input_payload,
+        output_json=output_json,
+        cache_used=cache_used,
+        cache_source=cache_source,
+        cache_key=cache_key,
+        response_time_ms=response_time_ms
+    )
+
+    return TaskResult(output, cache_source, cache_key, model_name, response_time_ms)
+
+
+def request_fields(task_type: str, text: str) -> Dict[str, Any]:
+    """
+    Output fields describing this request's input rather than the model's answer.
+    They are kept out of the cached output, which is shared by inputs differing only
+    in spacing (or case), and added to each response instead.
+    """
+    if task_type == "summarization":
+        return {"original_length": len(text)}
+    if task_type == "sentiment":
+        return {"text": text}
+    return {}
+
+
+def with_fields(output: Union[bytes, Dict[str, Any]], fields: Dict[str, Any]) -> Union[bytes, Dict[str, Any]]:
+    """
+    Merge fields into an (encoded or decoded) output. The output is only decoded when there
+    is something to merge; fields replace same-named keys, such as those in entries cached
+    before the fields were moved out of the output.
+    """
+    if not fields:
+        return output
+    decoded = orjson.loads(output) if isinstance(output, bytes) else output
+    return {**decoded, **fields}
+
+
+def task_response(result: TaskResult, extra_fields: Optional[Dict[str, Any]] = None) -> Response:
+    """
+    Build the JSON response by appending cache metadata to the encoded output, skipping
+    FastAPI's jsonable_encoder pass. Extra fields are merged into the output first.
+    """
+    meta = orjson.dumps({
+        "cache_hit": result.cache_hit,
+        "cache_source": result.cache_source,
+        "response_time_ms": result.response_time_ms
+    })
+    output = with_fields(result.output, extra_fields)
+    body = output if isinstance(output, bytes) else orjson.dumps(output)
+    if body != b"{}":
+        body = body[:-1] + b"," + meta[1:]
+    else:
+        body = meta
+    return Response(content=body, media_type="application/json")
+
+
+def sse_event(data: Dict[str, Any]) -> bytes:
+    """
+    Encode one server-sent event carrying a JSON object.
+    """
+    return b"data: " + orjson.dumps(data) + b"\n\n"
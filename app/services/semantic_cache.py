@@ -0,0 +1,91 @@
+"""
+Near-Duplicate Prompt Index
+Maps short prompts to the cache key of a previously answered prompt with nearly the same wording
+"""
+import re
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+import orjson
+
+from app.core.config import SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Boundary markers, so the first and last words form shingles of their own
+_START, _END = "\x02", "\x03"
+
+# Only short prompts are matched; near-identical long texts can still differ in what matters
+MAX_PROMPT_TOKENS = 64
+
+
+class SemanticCache:
+    """
+    In-process index of recently answered prompts per (task type, params), matched by
+    Jaccard similarity of their word-bigram shingles. Shingles keep word order and every
+    word, so reordered prompts ("dog bites man" / "man bites dog") or prompts differing in
+    a content word don't match; at a threshold near 1.0 only differences in case,
+    punctuation and spacing do.
+    A match only yields a cache key; the answer itself still comes from the regular cache.
+    """
+
+    def __init__(self, max_entries: int, threshold: float):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._buckets: Dict[Tuple[str, bytes], "OrderedDict[FrozenSet[Tuple[str, str]], str]"] = {}
+
+    @staticmethod
+    def _bucket_key(task_type: str, params: Optional[Dict[str, Any]]) -> Tuple[str, bytes]:
+        return task_type, orjson.dumps(params or {}, option=orjson.OPT_SORT_KEYS)
+
+    @staticmethod
+    def _shingles(text: str) -> Optional[FrozenSet[Tuple[str, str]]]:
+        """
+        Set of consecutive word pairs of a prompt, or None if it is empty or too long to match.
+        """
+        words = _TOKEN_RE.findall(text.casefold())
+        if not words or len(words) > MAX_PROMPT_TOKENS:
+            return None
+        padded = [_START, *words, _END]
+        return frozenset(zip(padded, padded[1:]))
+
+    def lookup(self, task_type: str, params: Optional[Dict[str, Any]], text: str) -> Optional[str]:
+        """
+        Return the cache key of the most similar indexed prompt at or above the threshold.
+        """
+        bucket = self._buckets.get(self._bucket_key(task_type, params))
+        if not bucket:
+            return None
+        shingles = self._shingles(text)
+        if shingles is None:
+            return None
+
+        best_key, best_score = None, self.threshold
+        size = len(shingles)
+        for other, cache_key in bucket.items():
+            other_size = len(other)
+            # Jaccard can't exceed the ratio of the set sizes
+            if min(size, other_size) < best_score * max(size, other_size):
+                continue
+            shared = len(shingles & other)
+            score = shared / (size + other_size - shared)
+            if score >= best_score:
+                best_key, best_score = cache_key, score
+        return best_key
+
+    def add(self, task_type: str, params: Optional[Dict[str, Any]], text: str, cache_key: str):
+        """
+        Index a prompt whose answer is stored under cache_key, evicting the oldest entry when full.
+        """
+        shingles = self._shingles(text)
+        if shingles is None:
+            return
+        bucket = self._buckets.setdefault(self._bucket_key(task_type, params), OrderedDict())
+        bucket[shingles] = cache_key
+        bucket.move_to_end(shingles)
+        if len(bucket) > self.max_entries:
+            bucket.popitem(last=False)
+
+
+# Global near-duplicate index (None when disabled)
+semantic_cache = SemanticCache(SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD) if SEMANTIC_CACHE_ENABLED else None
@@ -1,9 +1,9 @@
-import json, hashlib
+import orjson
 
 def canonical_json(obj) -> str:
-    return json.dumps(obj, sort_keys=True, separators=(',',':'))
+    return canonical_json_bytes(obj).decode('utf-8')
 
-def make_cache_key(task_type: str, model_name: str, input_obj) -> str:
-    canon = canonical_json(input_obj)
-    digest = hashlib.sha256(canon.encode('utf-8')).hexdigest()
-    return f"{task_type}:{model_name}:{digest}"
+def canonical_json_bytes(obj) -> bytes:
+    # orjson encodes small dicts in a few hundred ns, less than a Python-level
+    # sorted()/join() shortcut would cost, and keeps str/number values distinct
+    return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
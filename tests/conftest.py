@@ -0,0 +1,12 @@
+"""
+pytest fixtures shared by the test scripts (each script also runs standalone via its main()).
+"""
+import pytest
+
+
+@pytest.fixture(scope="module")
+def session():
+    """One keep-alive session per test module, as test_api.main() shares one across its tests."""
+    requests = pytest.importorskip("requests")
+    with requests.Session() as s:
+        yield s
@@ -23,15 +23,15 @@ def print_response(title, response):
         print(response.text)
 
 
-def test_health_check():
+def test_health_check(session):
     """Test health check endpoint."""
     print("\n🏥 Testing Health Check...")
-    response = requests.get(f"{BASE_URL}/api/v1/health")
+    response = session.get(f"{BASE_URL}/api/v1/health")
     print_response("Health Check", response)
     return response.status_code == 200
 
 
-def test_text_summarization():
+def test_text_summarization(session):
     """Test text summarization task."""
     print("\n📝 Testing Text Summarization...")
     
@@ -42,17 +42,17 @@ def test_text_summarization():
     }
     
     # First request (cache miss)
-    start = time.time()
-    response = requests.post(f"{BASE_URL}/api/v1/predict", json=payload)
-    first_time = time.time() - start
+    start = time.perf_counter()
+    response = session.post(f"{BASE_URL}/api/v1/predict", json=payload)
+    first_time = time.perf_counter() - start
     print_response("Summarization - First Request (Cache Miss)", response)
     print(f"⏱️  Response Time: {first_time:.2f}s")
     
     # Second request (cache hit)
     time.sleep(1)
-    start = time.time()
-    response2 = requests.post(f"{BASE_URL}/api/v1/predict", json=payload)
-    second_time = time.time() - start
+    start = time.perf_counter()
+    response2 = session.post(f"{BASE_URL}/api/v1/predict", json=payload)
+    second_time = time.perf_counter() - start
     print_response("Summarization - Second Request (Cache Hit)", response2)
     print(f"⏱️  Response Time: {second_time:.2f}s")
     print(f"🚀 Speed Improvement: {first_time/second_time:.1f}x faster")
@@ -60,7 +60,7 @@ def test_text_summarization():
     return response.status_code == 200
 
 
-def test_sentiment_analysis():
+def test_sentiment_analysis(session):
     """Test sentiment analysis task."""
     print("\n😊 Testing Sentiment Analysis...")
     
@@ -69,12 +69,12 @@ def test_sentiment_analysis():
         "input": "I absolutely love this product! It exceeded all my expectations and the customer service was amazing!"
     }
     
-    response = requests.post(f"{BASE_URL}/api/v1/predict", json=payload)
+    response = session.post(f"{BASE_URL}/api/v1/predict", json=payload)
     print_response("Sentiment Analysis", response)
     return response.status_code == 200
 
 
-def test_image_captioning():
+def test_image_captioning(session):
     """Test image captioning task."""
     print("\n🖼️  Testing Image Captioning...")
     
@@ -84,15 +84,54 @@ def test_image_captioning():
         "input": "https://huggingface.co/datasets/mishig/sample_images/resolve/main/cat-5.jpg"
     }
     
-    response = requests.post(f"{BASE_URL}/api/v1/predict", json=payload)
+    response = session.post(f"{BASE_URL}/api/v1/predict", json=payload)
     print_response("Image Captioning", response)
     return response.status_code == 200
 
 
-def test_statistics():
+def test_chat_stream(session):
+    """Test that streamed chat deltas arrive before the model has finished."""
+    print("\n💬 Testing Chat Streaming...")
+    
+    # A unique message, so the reply comes from the model rather than the cache
+    message = f"Write three sentences about caching. (run {time.time_ns()})"
+    start = time.perf_counter()
+    chunks = []
+    
+    with session.post(
+        f"{BASE_URL}/api/v1/text/chat/stream",
+        data={"message": message},
+        stream=True,
+        timeout=60
+    ) as response:
+        print(f"Status Code: {response.status_code}")
+        print(f"Content-Encoding: {response.headers.get('content-encoding', 'none')}")
+        if response.status_code != 200:
+            return False
+        # chunk_size=None yields each network read as it arrives
+        for chunk in response.iter_content(chunk_size=None):
+            chunks.append((time.perf_counter() - start, chunk))
+    
+    body = b"".join(chunk for _, chunk in chunks)
+    events = [json.loads(line[6:]) for line in body.split(b"\n") if line.startswith(b"data: ")]
+    final = events[-1] if events else {}
+    if not final.get("done") or "error" in final:
+        print(f"❌ Stream failed: {final}")
+        return False
+    
+    first_at, first_chunk = chunks[0]
+    print(f"Events: {len(events)} | Reads: {len(chunks)} | First read: {first_at:.3f}s | Done: {chunks[-1][0]:.3f}s")
+    # A buffered (e.g. compressed) stream arrives in one piece that already holds the done event
+    streamed = b'"done"' not in first_chunk
+    if not streamed:
+        print("❌ Deltas were not delivered before the model finished")
+    return streamed
+
+
+def test_statistics(session):
     """Test statistics endpoint."""
     print("\n📊 Testing Statistics...")
-    response = requests.get(f"{BASE_URL}/api/v1/statistics?days=7")
+    response = session.get(f"{BASE_URL}/api/v1/statistics?days=7")
     print_response("Cache Statistics", response)
     return response.status_code == 200
 
@@ -103,10 +142,13 @@ def main():
     print("  AI Response Caching POC - API Test Suite")
     print("="*60)
     
+    # One keep-alive session shared by every test, so calls reuse a single connection
+    session = requests.Session()
+    
     try:
         # Test connection
         print("\n🔌 Connecting to API...")
-        response = requests.get(BASE_URL, timeout=5)
+        response = session.get(BASE_URL, timeout=5)
         if response.status_code != 200:
             print(f"❌ API not responding at {BASE_URL}")
             print("   Make sure the server is running: docker-compose up")
@@ -116,11 +158,12 @@ def main():
         
         # Run tests
         results = {
-            "Health Check": test_health_check(),
-            "Text Summarization": test_text_summarization(),
-            "Sentiment Analysis": test_sentiment_analysis(),
-            "Image Captioning": test_image_captioning(),
-            "Statistics": test_statistics()
+            "Health Check": test_health_check(session),
+            "Text Summarization": test_text_summarization(session),
+            "Sentiment Analysis": test_sentiment_analysis(session),
+            "Image Captioning": test_image_captioning(session),
+            "Chat Streaming": test_chat_stream(session),
+            "Statistics": test_statistics(session)
         }
         
         # Print summary
@@ -146,6 +189,8 @@ def main():
         print("   Make sure the server is running: docker-compose up")
     except Exception as e:
         print(f"\n❌ Error: {e}")
+    finally:
+        session.close()
 
 
 if __name__ == "__main__":
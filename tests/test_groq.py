@@ -3,6 +3,7 @@ Quick test to check Groq API connectivity and model availability.
 """
 import os
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -29,16 +30,24 @@ models_to_try = [
     "mixtral-8x7b-32768"
 ]
 
-for model in models_to_try:
-    print(f"\n🧪 Testing model: {model}")
+# Shared keep-alive session; models are probed in parallel and reported in order
+session = requests.Session()
+
+
+def probe(model):
     payload = {
         "model": model,
         "messages": [{"role": "user", "content": "Say hello"}],
         "max_tokens": 50
     }
-    
-    response = requests.post(url, json=payload, headers=headers)
-    
+    return session.post(url, json=payload, headers=headers)
+
+
+with ThreadPoolExecutor(max_workers=len(models_to_try)) as pool:
+    responses = list(pool.map(probe, models_to_try))
+
+for model, response in zip(models_to_try, responses):
+    print(f"\n🧪 Testing model: {model}")
     if response.status_code == 200:
         result = response.json()
         print(f"✅ SUCCESS with {model}")
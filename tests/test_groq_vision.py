@@ -2,6 +2,7 @@
 Test Groq Vision API
 """
 import sys
+import asyncio
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
@@ -18,31 +19,39 @@ response = requests.get(test_url, timeout=10)
 image_bytes = response.content
 print(f"Downloaded {len(image_bytes)} bytes")
 
+# Run captioning and classification concurrently in one event loop
+async def run_both():
+    return await asyncio.gather(
+        caption_image_groq(image_bytes),
+        classify_image_groq(image_bytes),
+        return_exceptions=True
+    )
+
+caption_result, classify_result = asyncio.run(run_both())
+
 # Test captioning
 print("\n" + "=" * 60)
 print("Testing Image Captioning")
 print("=" * 60)
-try:
-    result = caption_image_groq(image_bytes)
+if isinstance(caption_result, Exception):
+    print(f"❌ Captioning failed: {caption_result}")
+else:
     print("✅ Captioning successful!")
-    print(f"Caption: {result['caption']}")
-    print(f"Model: {result['model_used']}")
-except Exception as e:
-    print(f"❌ Captioning failed: {e}")
+    print(f"Caption: {caption_result['caption']}")
+    print(f"Model: {caption_result['model_used']}")
 
 # Test classification
 print("\n" + "=" * 60)
 print("Testing Image Classification")
 print("=" * 60)
-try:
-    result = classify_image_groq(image_bytes)
+if isinstance(classify_result, Exception):
+    print(f"❌ Classification failed: {classify_result}")
+else:
     print("✅ Classification successful!")
     print(f"Predictions:")
-    for pred in result['predictions']:
+    for pred in classify_result['predictions']:
         print(f"  - {pred['label']}: {pred['score']:.2f}")
-    print(f"Model: {result['model_used']}")
-except Exception as e:
-    print(f"❌ Classification failed: {e}")
+    print(f"Model: {classify_result['model_used']}")
 
 print("\n" + "=" * 60)
 print("Test Complete!")
@@ -0,0 +1,84 @@
+"""
+Test parsing of the vision model's "label: score" classification replies
+into {"label", "score"} predictions (no server or API key needed).
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.groq_vision_service import _parse_predictions
+
+
+def test_plain_and_numbered_lines():
+    """Bulleted and numbered "label: score" lines are parsed in order."""
+    text = "1. Labrador: 0.92\n2) Golden Retriever: 0.05\n- cat: 0.02\n• fox: 0.01"
+    assert _parse_predictions(text) == [
+        {"label": "Labrador", "score": 0.92},
+        {"label": "Golden Retriever", "score": 0.05},
+        {"label": "cat", "score": 0.02},
+        {"label": "fox", "score": 0.01},
+    ]
+
+
+def test_markdown_emphasis():
+    """Bold labels keep their scores, whether the colon is inside or outside the emphasis."""
+    text = "1. **Labrador:** 0.92\n2. **Golden Retriever**: 0.05\n* **cat: 0.02**"
+    assert _parse_predictions(text) == [
+        {"label": "Labrador", "score": 0.92},
+        {"label": "Golden Retriever", "score": 0.05},
+        {"label": "cat", "score": 0.02},
+    ]
+
+
+def test_percentages_are_scaled():
+    """Percentages and bare numbers above 1 become fractions."""
+    text = "dog: 85%\ncat: 12 %\nfox: 3"
+    assert _parse_predictions(text) == [
+        {"label": "dog", "score": 0.85},
+        {"label": "cat", "score": 0.12},
+        {"label": "fox", "score": 0.03},
+    ]
+
+
+def test_parenthesized_note_after_score():
+    """A note after the score doesn't hide it."""
+    assert _parse_predictions("dog: 0.9 (very likely)") == [{"label": "dog", "score": 0.9}]
+
+
+def test_lines_without_numeric_score_are_skipped():
+    """Headers and prose containing a colon are not predictions."""
+    text = (
+        "Here are the top categories:\n"
+        "**Top 5 categories:**\n"
+        "Note: n/a\n"
+        "Confidence scores: high\n"
+        "Note: 2 dogs are visible\n"
+        "dog: 0.9\n"
+    )
+    assert _parse_predictions(text) == [{"label": "dog", "score": 0.9}]
+
+
+def test_limit():
+    """At most limit predictions are returned."""
+    text = "\n".join(f"label {i}: 0.{i}" for i in range(1, 9))
+    assert len(_parse_predictions(text)) == 5
+    assert len(_parse_predictions(text, limit=3)) == 3
+
+
+def main():
+    """Run all tests."""
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASSED - {test.__name__}")
+        except AssertionError:
+            failed += 1
+            print(f"❌ FAILED - {test.__name__}")
+    print(f"\nTotal: {len(tests) - failed}/{len(tests)} tests passed")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,71 @@
+"""
+Test the near-duplicate prompt index: only case, punctuation and spacing
+differences may share an answer; reordered or reworded prompts must not.
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.semantic_cache import SemanticCache
+
+THRESHOLD = 0.95
+
+
+def make_index(*prompts):
+    """Index each prompt under a cache key named after its position."""
+    index = SemanticCache(max_entries=100, threshold=THRESHOLD)
+    for i, prompt in enumerate(prompts):
+        index.add("chat", {}, prompt, f"key-{i}")
+    return index
+
+
+def test_case_punctuation_and_spacing_match():
+    """Same words in the same order reuse the cached answer."""
+    index = make_index("What is the capital of France?")
+    assert index.lookup("chat", {}, "what is the   capital of france") == "key-0"
+
+
+def test_reordered_prompts_do_not_match():
+    """Word order changes the question."""
+    index = make_index("dog bites man")
+    assert index.lookup("chat", {}, "man bites dog") is None
+
+
+def test_one_word_difference_does_not_match():
+    """Prompts differing in a single content word are different questions."""
+    prompt = "Explain how the Redis cache layer stores model responses for the text summarization endpoint today"
+    index = make_index(prompt)
+    assert index.lookup("chat", {}, prompt.replace("Redis", "Memcached")) is None
+    assert index.lookup("chat", {}, prompt.replace("stores", "evicts")) is None
+
+
+def test_pronouns_are_kept():
+    """Pronouns and filler words carry meaning and are not dropped."""
+    index = make_index("can you help me")
+    assert index.lookup("chat", {}, "can i help you") is None
+    assert index.lookup("chat", {}, "help") is None
+
+
+def test_params_are_separate():
+    """Prompts only match within the same task and params."""
+    index = make_index("What is the capital of France?")
+    assert index.lookup("chat", {"temperature": 0}, "What is the capital of France?") is None
+
+
+def main():
+    """Run all tests."""
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASSED - {test.__name__}")
+        except AssertionError:
+            failed += 1
+            print(f"❌ FAILED - {test.__name__}")
+    print(f"\nTotal: {len(tests) - failed}/{len(tests)} tests passed")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -6,67 +6,46 @@ import requests
 from datetime import datetime
 import time
 
+from ui.utils import fetch_health
+
 API_BASE_URL = "http://127.0.0.1:8000/api/v1"
 
+# (card title, /health field) for each backing service
+SERVICE_CARDS = (
+    ("⚡ Memcached", "memcached_connected"),
+    ("💾 Redis", "redis_connected"),
+    ("🗄️ Database", "database_connected"),
+)
+
+# Card markup, built once at import; only the per-service status is filled in per rerun
+API_ONLINE_CARD = '<div class="metric-card" style="flex: 1;"><h3>✅ API Status</h3><h2>Online</h2></div>'
+SERVICE_CARD = '<div class="metric-card" style="flex: 1; background: {bg};"><h3>{title}</h3><h2>{status}</h2></div>'
+SERVICE_STATES = {
+    True: {"bg": "#2ecc71", "status": "🟢 Connected"},
+    False: {"bg": "#e74c3c", "status": "🔴 Disconnected"},
+}
+
 def show():
     """Display home page with system overview"""
     
     st.header("🏠 Dashboard Overview")
     
     # Check API health with better error handling
-    col1, col2, col3, col4 = st.columns(4)
-    
     try:
-        health_response = requests.get(f"{API_BASE_URL}/health", timeout=5)
-        if health_response.status_code == 200:
-            health_data = health_response.json()
-            
-            with col1:
-                st.markdown("""
-                <div class="metric-card">
-                    <h3>✅ API Status</h3>
-                    <h2>Online</h2>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col2:
-                memcache_status = health_data.get("memcached_connected", False)
-                status_color = "🟢" if memcache_status else "🔴"
-                status_text = "Connected" if memcache_status else "Disconnected"
-                bg_color = "#2ecc71" if memcache_status else "#e74c3c"
-                st.markdown(f"""
-                <div class="metric-card" style="background: {bg_color};">
-                    <h3>⚡ Memcached</h3>
-                    <h2>{status_color} {status_text}</h2>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col3:
-                redis_status = health_data.get("redis_connected", False)
-                status_color = "🟢" if redis_status else "🔴"
-                status_text = "Connected" if redis_status else "Disconnected"
-                bg_color = "#2ecc71" if redis_status else "#e74c3c"
-                st.markdown(f"""
-                <div class="metric-card" style="background: {bg_color};">
-                    <h3>💾 Redis</h3>
-                    <h2>{status_color} {status_text}</h2>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col4:
-                db_status = health_data.get("database_connected", False)
-                status_color = "🟢" if db_status else "🔴"
-                status_text = "Connected" if db_status else "Disconnected"
-                bg_color = "#2ecc71" if db_status else "#e74c3c"
-                st.markdown(f"""
-                <div class="metric-card" style="background: {bg_color};">
-                    <h3>🗄️ Database</h3>
-                    <h2>{status_color} {status_text}</h2>
-                </div>
-                """, unsafe_allow_html=True)
+        try:
+            health_data = fetch_health(f"{API_BASE_URL}/health")
+        except requests.exceptions.HTTPError:
+            health_data = None
+        
+        if health_data is not None:
+            # All four status cards in one markdown element (one delta per rerun instead of four)
+            cards = [API_ONLINE_CARD]
+            for title, key in SERVICE_CARDS:
+                cards.append(SERVICE_CARD.format(title=title, **SERVICE_STATES[bool(health_data.get(key))]))
+            st.markdown(f'<div style="display: flex; gap: 1rem;">{"".join(cards)}</div>', unsafe_allow_html=True)
             
             # Show warning if services are disconnected
-            if not (memcache_status and redis_status):
+            if not (health_data.get("memcached_connected") and health_data.get("redis_connected")):
                 st.warning("⚠️ **Cache services not connected!** Start Docker Desktop and run: `docker-compose up -d`")
         else:
             st.error("❌ Failed to connect to API")
@@ -6,9 +6,39 @@ import requests
 from PIL import Image
 import io
 import base64
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from ui.utils import API_TIMEOUT, error_text, http_session, parse_json, result_field
 
 API_BASE_URL = "http://127.0.0.1:8000/api/v1"
 
+# The vision model gains nothing from larger inputs; bigger uploads are shrunk before sending
+MAX_UPLOAD_EDGE = 1024
+
+# Results kept per browser session, so clicking Process again on the same image skips the API
+RESULT_MEMO_SIZE = 20
+
+@st.cache_resource(ttl=300, max_entries=16, show_spinner=False)
+def fetch_image(url: str) -> bytes:
+    """Image bytes for a URL preview, kept across reruns so widget changes don't re-download it"""
+    response = http_session.get(url, timeout=10)
+    response.raise_for_status()
+    return response.content
+
+def downscale_for_upload(uploaded_file) -> bytes:
+    """Resize images whose longest edge exceeds MAX_UPLOAD_EDGE and re-encode as JPEG; smaller ones are sent as-is"""
+    # PIL reads the upload's in-memory buffer directly; bytes are only copied out for small images
+    image = Image.open(uploaded_file)
+    if max(image.size) <= MAX_UPLOAD_EDGE:
+        return uploaded_file.getvalue()
+    # JPEGs are decoded straight at a reduced scale (DCT scaling), skipping most of the full-size decode
+    image.draft("RGB", (MAX_UPLOAD_EDGE, MAX_UPLOAD_EDGE))
+    image.thumbnail((MAX_UPLOAD_EDGE, MAX_UPLOAD_EDGE), Image.LANCZOS)
+    buf = io.BytesIO()
+    image.convert("RGB").save(buf, format="JPEG", quality=85, optimize=True)
+    return buf.getvalue()
+
 def show():
     """Display image processing interface"""
     
@@ -17,7 +47,7 @@ def show():
     # Task selection
     task = st.selectbox(
         "Select Task",
-        ["Image Captioning", "Image Classification"],
+        ["Image Captioning", "Image Classification", "Caption + Classification"],
         help="Choose the image processing task"
     )
     
@@ -29,7 +59,7 @@ def show():
     )
     
     image_data = None
-    image_display = None
+    uploaded_file = None
     
     # Handle input method
     if input_method == "📤 Upload Image":
@@ -38,10 +68,6 @@ def show():
             type=["png", "jpg", "jpeg"],
             help="Upload an image file (PNG, JPG, JPEG)"
         )
-        
-        if uploaded_file:
-            image_data = uploaded_file.getvalue()
-            image_display = Image.open(io.BytesIO(image_data))
     
     else:  # Image URL
         image_url = st.text_input(
@@ -50,149 +76,225 @@ def show():
             help="Provide a direct URL to an image"
         )
         
-        if image_url:
+        # The shared fetch_image cache expires after 5 minutes; the session keeps the URL it is
+        # showing, so widget changes never re-download the image this user is working on
+        url_image = st.session_state.get("url_image")
+        if image_url and url_image and url_image[0] == image_url:
+            image_data = url_image[1]
+        elif image_url:
             try:
-                response = requests.get(image_url, timeout=10)
-                if response.status_code == 200:
-                    image_data = response.content
-                    image_display = Image.open(io.BytesIO(image_data))
-                else:
-                    st.error(f"Failed to fetch image: {response.status_code}")
+                image_data = fetch_image(image_url)
+                st.session_state["url_image"] = (image_url, image_data)
+            except requests.exceptions.HTTPError as e:
+                st.error(f"Failed to fetch image: {e.response.status_code}")
             except Exception as e:
                 st.error(f"Error loading image: {str(e)}")
     
-    # Display image preview
-    if image_display:
+    # Display image preview; the encoded bytes go to the browser as-is, so reruns
+    # don't decode the image with PIL (only downscale_for_upload does, on Process).
+    # Uploads stay in Streamlit's buffer and are only copied out on Process
+    preview = uploaded_file or image_data
+    if preview:
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
-            st.image(image_display, caption="Preview", use_container_width=True)
+            st.image(preview, caption="Preview", use_container_width=True)
     
     # Process button
-    if st.button(f"🚀 Process Image", type="primary", disabled=not image_data):
+    if st.button(f"🚀 Process Image", type="primary", disabled=not preview):
+        if uploaded_file:
+            image_data = downscale_for_upload(uploaded_file)
         if task == "Image Captioning":
             process_caption(image_data, input_method == "🔗 Image URL", 
                           image_url if input_method == "🔗 Image URL" else None)
-        else:
+        elif task == "Image Classification":
             process_classification(image_data, input_method == "🔗 Image URL",
                                  image_url if input_method == "🔗 Image URL" else None)
+        else:
+            process_both(image_data, input_method == "🔗 Image URL",
+                         image_url if input_method == "🔗 Image URL" else None)
+
+def post_image_task(task_path, image_data, is_url, image_url=None):
+    """POST an image task ("caption" or "classify") to its URL or upload endpoint"""
+    if is_url:
+        # Use URL endpoint with form data
+        return http_session.post(
+            f"{API_BASE_URL}/image/{task_path}",
+            data={"image_url": image_url},
+            timeout=API_TIMEOUT
+        )
+    # Use upload endpoint
+    files = {"image": ("image.jpg", image_data, "image/jpeg")}
+    return http_session.post(
+        f"{API_BASE_URL}/image/upload/{task_path}",
+        files=files,
+        timeout=API_TIMEOUT
+    )
+
+def image_key(image_data, is_url, image_url=None):
+    """Identity of the image for the session result memo: its URL, or a hash of the uploaded bytes"""
+    return image_url if is_url else hashlib.blake2b(image_data, digest_size=16).hexdigest()
+
+def remembered_result(task_path, key):
+    """A result this browser session already received for the same task and image, marked as served by the UI"""
+    result = st.session_state.get("image_results", {}).get((task_path, key))
+    if result is None:
+        return None
+    return {**result, "cache_source": "ui_session", "response_time_ms": 0.0}
+
+def remember_result(task_path, key, result):
+    """Keep a result for repeat clicks, evicting the oldest beyond RESULT_MEMO_SIZE"""
+    results = st.session_state.setdefault("image_results", {})
+    results[(task_path, key)] = result
+    if len(results) > RESULT_MEMO_SIZE:
+        del results[next(iter(results))]
+
+def handle_response(task_path, key, response):
+    """Return a successful response's result (remembering it), or show the error and return None"""
+    if response.status_code != 200:
+        st.error(f"Error: {response.status_code} - {error_text(response)}")
+        return None
+    result = parse_json(response)
+    remember_result(task_path, key, result)
+    return result
 
 def process_caption(image_data, is_url, image_url=None):
     """Process image captioning"""
-    with st.spinner("Generating caption..."):
-        try:
-            if is_url:
-                # Use URL endpoint with form data
-                response = requests.post(
-                    f"{API_BASE_URL}/image/caption",
-                    data={"image_url": image_url},
-                    timeout=30
-                )
-            else:
-                # Use upload endpoint
-                files = {"image": ("image.jpg", image_data, "image/jpeg")}
-                response = requests.post(
-                    f"{API_BASE_URL}/image/upload/caption",
-                    files=files,
-                    timeout=30
-                )
-            
-            if response.status_code == 200:
-                result = response.json()
-                
-                st.success("✅ Caption Generated!")
-                
-                # Display metrics
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    cache_source = result.get("cache_source", "model")
-                    st.metric("Cache Source", cache_source.upper())
-                with col2:
-                    response_time = result.get("response_time_ms", 0)
-                    st.metric("Response Time", f"{response_time:.2f}ms")
-                with col3:
-                    st.metric("Model", "Llama 4 Scout")
-                
-                # Display caption
-                st.markdown("### 📝 Generated Caption")
-                caption_text = result.get("caption", result.get("output", {}).get("caption", "No caption available"))
-                st.markdown(f'<div class="success-box" style="font-size: 1.2rem;">{caption_text}</div>', 
-                          unsafe_allow_html=True)
-                
-                # Cache performance info
-                if cache_source != "model":
-                    st.balloons()
-                    st.success("🎉 This was a cached response - Lightning fast!")
-                else:
-                    st.info("💡 Try the same image again to see caching in action!")
-            
-            else:
-                st.error(f"Error: {response.status_code} - {response.text}")
-        
-        except requests.exceptions.RequestException as e:
-            st.error(f"API Error: {str(e)}")
+    key = image_key(image_data, is_url, image_url)
+    result = remembered_result("caption", key)
+    if result is None:
+        with st.spinner("Generating caption..."):
+            try:
+                result = handle_response("caption", key, post_image_task("caption", image_data, is_url, image_url))
+            except requests.exceptions.RequestException as e:
+                st.error(f"API Error: {str(e)}")
+    if result is not None:
+        render_caption(result)
 
 def process_classification(image_data, is_url, image_url=None):
     """Process image classification"""
-    with st.spinner("Classifying image..."):
+    key = image_key(image_data, is_url, image_url)
+    result = remembered_result("classify", key)
+    if result is None:
+        with st.spinner("Classifying image..."):
+            try:
+                result = handle_response("classify", key, post_image_task("classify", image_data, is_url, image_url))
+            except requests.exceptions.RequestException as e:
+                st.error(f"API Error: {str(e)}")
+    if result is not None:
+        render_classification(result)
+
+    st.markdown("---")
+    st.info("**Powered by**: Groq Llama 4 Scout Vision Model (17B parameters)")
+
+def process_both(image_data, is_url, image_url=None):
+    """Caption and classify concurrently, so the wait is the slower call rather than the sum"""
+    key = image_key(image_data, is_url, image_url)
+    results = {task_path: remembered_result(task_path, key) for task_path in ("caption", "classify")}
+    missing = [task_path for task_path, result in results.items() if result is None]
+    
+    if missing and not is_url:
+        process_analyze(image_data, key, results)
+    elif missing:
+        with st.spinner("Captioning and classifying..."):
+            # Only the HTTP calls run in threads; Streamlit and session state stay on the script thread
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                futures = {
+                    task_path: pool.submit(post_image_task, task_path, image_data, is_url, image_url)
+                    for task_path in missing
+                }
+            for task_path, future in futures.items():
+                try:
+                    results[task_path] = handle_response(task_path, key, future.result())
+                except requests.exceptions.RequestException as e:
+                    st.error(f"API Error: {str(e)}")
+    
+    if results["caption"] is not None:
+        render_caption(results["caption"])
+    if results["classify"] is not None:
+        render_classification(results["classify"])
+
+    st.markdown("---")
+    st.info("**Powered by**: Groq Llama 4 Scout Vision Model (17B parameters)")
+
+def process_analyze(image_data, key, results):
+    """Upload the image once to the combined endpoint, which runs both tasks concurrently"""
+    with st.spinner("Captioning and classifying..."):
         try:
-            if is_url:
-                # Use URL endpoint with form data
-                response = requests.post(
-                    f"{API_BASE_URL}/image/classify",
-                    data={"image_url": image_url},
-                    timeout=30
-                )
-            else:
-                # Use upload endpoint
-                files = {"image": ("image.jpg", image_data, "image/jpeg")}
-                response = requests.post(
-                    f"{API_BASE_URL}/image/upload/classify",
-                    files=files,
-                    timeout=30
-                )
-            
+            files = {"image": ("image.jpg", image_data, "image/jpeg")}
+            response = http_session.post(f"{API_BASE_URL}/image/upload/analyze", files=files, timeout=API_TIMEOUT)
             if response.status_code == 200:
-                result = response.json()
-                
-                st.success("✅ Classification Complete!")
-                
-                # Display metrics
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    cache_source = result.get("cache_source", "model")
-                    st.metric("Cache Source", cache_source.upper())
-                with col2:
-                    response_time = result.get("response_time_ms", 0)
-                    st.metric("Response Time", f"{response_time:.2f}ms")
-                with col3:
-                    st.metric("Model", "Llama 4 Scout")
-                
-                # Display predictions
-                st.markdown("### 🏷️ Classification Results")
-                
-                predictions = result.get("predictions", result.get("output", {}).get("predictions", []))
-                
-                for i, pred in enumerate(predictions[:5], 1):
-                    label = pred.get("label", "Unknown")
-                    score = pred.get("score", 0)
-                    
-                    # Progress bar for confidence
-                    st.markdown(f"**{i}. {label}**")
-                    st.progress(score)
-                    st.caption(f"Confidence: {score*100:.2f}%")
-                
-                # Cache performance info
-                if cache_source != "model":
-                    st.balloons()
-                    st.success("🎉 This was a cached response - Lightning fast!")
-                else:
-                    st.info("💡 Try the same image again to see caching in action!")
-            
+                analysis = parse_json(response)
+                for task_path, part in (("caption", analysis["caption"]), ("classify", analysis["classification"])):
+                    if "error" in part:
+                        st.error(f"Error: {part['error']}")
+                    else:
+                        remember_result(task_path, key, part)
+                        results[task_path] = part
             else:
-                st.error(f"Error: {response.status_code} - {response.text}")
-        
+                st.error(f"Error: {response.status_code} - {error_text(response)}")
         except requests.exceptions.RequestException as e:
             st.error(f"API Error: {str(e)}")
 
-    st.markdown("---")
-    st.info("**Powered by**: Groq Llama 4 Scout Vision Model (17B parameters)")
+def render_caption(result):
+    """Render a caption result"""
+    st.success("✅ Caption Generated!")
+    
+    # Display metrics
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        cache_source = result.get("cache_source", "model")
+        st.metric("Cache Source", cache_source.upper())
+    with col2:
+        response_time = result.get("response_time_ms", 0)
+        st.metric("Response Time", f"{response_time:.2f}ms")
+    with col3:
+        st.metric("Model", "Llama 4 Scout")
+    
+    # Display caption
+    st.markdown("### 📝 Generated Caption")
+    caption_text = result_field(result, "caption", "No caption available")
+    st.markdown(f'<div class="success-box" style="font-size: 1.2rem;">{caption_text}</div>', 
+              unsafe_allow_html=True)
+    
+    # Cache performance info
+    if cache_source != "model":
+        st.balloons()
+        st.success("🎉 This was a cached response - Lightning fast!")
+    else:
+        st.info("💡 Try the same image again to see caching in action!")
+
+def render_classification(result):
+    """Render a classification result"""
+    st.success("✅ Classification Complete!")
+    
+    # Display metrics
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        cache_source = result.get("cache_source", "model")
+        st.metric("Cache Source", cache_source.upper())
+    with col2:
+        response_time = result.get("response_time_ms", 0)
+        st.metric("Response Time", f"{response_time:.2f}ms")
+    with col3:
+        st.metric("Model", "Llama 4 Scout")
+    
+    # Display predictions
+    st.markdown("### 🏷️ Classification Results")
+    
+    predictions = result_field(result, "predictions", [])
+    
+    for i, pred in enumerate(predictions[:5], 1):
+        label = pred.get("label", "Unknown")
+        score = pred.get("score", 0)
+        
+        # Progress bar for confidence
+        st.markdown(f"**{i}. {label}**")
+        st.progress(score)
+        st.caption(f"Confidence: {score*100:.2f}%")
+    
+    # Cache performance info
+    if cache_source != "model":
+        st.balloons()
+        st.success("🎉 This was a cached response - Lightning fast!")
+    else:
+        st.info("💡 Try the same image again to see caching in action!")
@@ -4,6 +4,8 @@ Settings Page
 import streamlit as st
 import requests
 
+from ui.utils import fetch_health
+
 API_BASE_URL = "http://127.0.0.1:8000/api/v1"
 
 def show():
@@ -98,10 +100,15 @@ def show():
     if st.button("🔍 Check System Health", type="primary"):
         with st.spinner("Checking system health..."):
             try:
-                response = requests.get(f"{api_url}/health", timeout=5)
+                # An explicit check skips the cached result (and refreshes it for the home page)
+                fetch_health.clear()
+                try:
+                    health = fetch_health(f"{api_url}/health")
+                except requests.exceptions.HTTPError as e:
+                    health = None
+                    st.error(f"Health check failed: {e.response.status_code}")
                 
-                if response.status_code == 200:
-                    health = response.json()
+                if health is not None:
                     
                     st.success("✅ System is healthy!")
                     
@@ -125,9 +132,6 @@ def show():
                     
                     # Display timestamp
                     st.caption(f"Last checked: {health.get('timestamp', 'N/A')}")
-                
-                else:
-                    st.error(f"Health check failed: {response.status_code}")
             
             except requests.exceptions.RequestException as e:
                 st.error(f"❌ Connection Error: {str(e)}")
@@ -3,23 +3,102 @@ Statistics Page
 """
 import streamlit as st
 import requests
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
+from ui.utils import http_session, parse_json
+
 API_BASE_URL = "http://127.0.0.1:8000/api/v1"
 
+# Bar colours per cache source, and trend marker colours per source
+SOURCE_COLORS = {'memcache': '#667eea', 'redis': '#764ba2'}
+SOURCE_COLOR_DEFAULT = '#f093fb'
+MARKER_COLORS = {'memcache': '#2ecc71', 'redis': '#f39c12', 'model': '#e74c3c'}
+
+# Display label per cache source in the recent activity table; anything else came from the model
+CACHE_STATUS_LABELS = {'memcache': '⚡ Memcached', 'redis': '💾 Redis'}
+CACHE_STATUS_DEFAULT = '🤖 AI Model'
+
+# Static response-time cards, built once and sent as a single markdown element
+RESPONSE_TIME_CARD = (
+    '<div class="metric-card" style="flex: 1; background: linear-gradient(135deg, {start} 0%, {end} 100%);">'
+    '<h4>{title}</h4><h2>{latency}</h2><p>{note}</p></div>'
+)
+RESPONSE_TIME_CARDS = '<div style="display: flex; gap: 1rem;">{}</div>'.format("".join(
+    RESPONSE_TIME_CARD.format(start=start, end=end, title=title, latency=latency, note=note)
+    for start, end, title, latency, note in (
+        ("#667eea", "#764ba2", "⚡ Memcached (L1)", "~2ms", "Ultra-fast in-memory"),
+        ("#f093fb", "#f5576c", "💾 Redis (L2)", "~12ms", "Fast persistent cache"),
+        ("#4facfe", "#00f2fe", "🤖 Model (Cold)", "~1200ms", "AI model processing"),
+    )
+))
+
+# Recent activity refreshes itself on this interval (matching the fetch_statistics TTL)
+RECENT_ACTIVITY_REFRESH_SECONDS = 30
+
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_statistics() -> dict:
+    """Statistics JSON, reused across reruns and sessions for 30 seconds (errors are not cached)"""
+    response = http_session.get(f"{API_BASE_URL}/statistics", timeout=10)
+    response.raise_for_status()
+    return parse_json(response)
+
+# Plotly figures are built once per distinct data slice and shared read-only across reruns and sessions;
+# st.cache_resource returns the object itself, where st.cache_data would re-validate a pickled copy
+@st.cache_resource(max_entries=32, show_spinner=False)
+def cache_performance_figure(cache_hits: int, cache_misses: int) -> go.Figure:
+    """Hit/miss donut chart"""
+    fig = go.Figure(data=[go.Pie(
+        labels=['✅ Cache Hits (Fast!)', '🤖 Cache Misses (Slow)'],
+        values=[cache_hits, cache_misses],
+        marker_colors=['#2ecc71', '#e74c3c'],
+        hole=0.4,
+        textinfo='label+percent+value',
+        textfont_size=14
+    )])
+    fig.update_layout(
+        showlegend=True,
+        height=350,
+        margin=dict(t=20, b=20, l=20, r=20)
+    )
+    return fig
+
+# Plotly rather than st.bar_chart: Vega-Lite orders a nominal axis alphabetically, not by count
+@st.cache_resource(max_entries=32, show_spinner=False)
+def task_distribution_figure(task_types: tuple) -> go.Figure:
+    """Horizontal bar of requests per task type ordered by count, from (task, count) pairs"""
+    df = pd.DataFrame(list(task_types), columns=['Task', 'Count'])
+    df = df.sort_values('Count', ascending=True, kind='stable')
+    
+    fig = px.bar(df, x='Count', y='Task', orientation='h',
+               color='Count', color_continuous_scale='Viridis')
+    fig.update_layout(
+        showlegend=False,
+        height=300,
+        margin=dict(t=0, b=0, l=0, r=0)
+    )
+    return fig
+
 def show():
     """Display statistics and analytics"""
     
     st.header("📊 System Statistics & Analytics")
     
+    # The cached snapshot can be up to 30 seconds old; let users force a fresh one
+    if st.button("🔄 Refresh Statistics"):
+        fetch_statistics.clear()
+    
     # Fetch statistics
     try:
-        response = requests.get(f"{API_BASE_URL}/statistics", timeout=10)
+        try:
+            stats = fetch_statistics()
+        except requests.exceptions.HTTPError as e:
+            stats = None
+            st.error(f"Failed to fetch statistics: {e.response.status_code}")
         
-        if response.status_code == 200:
-            stats = response.json()
+        if stats is not None:
             
             # Overview metrics
             st.subheader("📈 Performance Overview")
@@ -55,20 +134,7 @@ def show():
                 st.subheader("🎯 Cache Performance")
                 
                 if cache_hits + cache_misses > 0:
-                    fig = go.Figure(data=[go.Pie(
-                        labels=['✅ Cache Hits (Fast!)', '🤖 Cache Misses (Slow)'],
-                        values=[cache_hits, cache_misses],
-                        marker_colors=['#2ecc71', '#e74c3c'],
-                        hole=0.4,
-                        textinfo='label+percent+value',
-                        textfont_size=14
-                    )])
-                    fig.update_layout(
-                        showlegend=True,
-                        height=350,
-                        margin=dict(t=20, b=20, l=20, r=20)
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
+                    st.plotly_chart(cache_performance_figure(cache_hits, cache_misses), use_container_width=True)
                     
                     # Performance insight
                     if hit_rate > 70:
@@ -86,27 +152,18 @@ def show():
                 
                 cache_sources = stats.get("cache_sources", {})
                 if cache_sources:
-                    # Create bar chart with colors
-                    sources = list(cache_sources.keys())
-                    values = list(cache_sources.values())
-                    colors = ['#667eea' if s == 'memcache' else '#764ba2' if s == 'redis' else '#f093fb' 
-                             for s in sources]
-                    
-                    fig = go.Figure(data=[go.Bar(
-                        x=[s.upper() for s in sources],
-                        y=values,
-                        marker_color=colors,
-                        text=values,
-                        textposition='auto',
-                    )])
-                    fig.update_layout(
-                        showlegend=False,
-                        height=350,
-                        xaxis_title="Source",
-                        yaxis_title="Requests",
-                        margin=dict(t=20, b=20, l=20, r=20)
+                    # A handful of bars needs no Plotly figure; st.bar_chart ships a small Vega-Lite spec
+                    st.bar_chart(
+                        pd.DataFrame({
+                            "Source": [s.upper() for s in cache_sources],
+                            "Requests": list(cache_sources.values()),
+                            "Color": [SOURCE_COLORS.get(s, SOURCE_COLOR_DEFAULT) for s in cache_sources],
+                        }),
+                        x="Source",
+                        y="Requests",
+                        color="Color",
+                        height=350
                     )
-                    st.plotly_chart(fig, use_container_width=True)
                     
                     # Show breakdown
                     memcache_pct = (cache_sources.get('memcache', 0) / total_requests * 100) if total_requests > 0 else 0
@@ -124,34 +181,7 @@ def show():
             # Response time comparison
             st.subheader("⏱️ Response Time Comparison")
             
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                st.markdown("""
-                <div class="metric-card" style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);">
-                    <h4>⚡ Memcached (L1)</h4>
-                    <h2>~2ms</h2>
-                    <p>Ultra-fast in-memory</p>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col2:
-                st.markdown("""
-                <div class="metric-card" style="background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%);">
-                    <h4>💾 Redis (L2)</h4>
-                    <h2>~12ms</h2>
-                    <p>Fast persistent cache</p>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col3:
-                st.markdown("""
-                <div class="metric-card" style="background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%);">
-                    <h4>🤖 Model (Cold)</h4>
-                    <h2>~1200ms</h2>
-                    <p>AI model processing</p>
-                </div>
-                """, unsafe_allow_html=True)
+            st.markdown(RESPONSE_TIME_CARDS, unsafe_allow_html=True)
             
             # Performance gain
             st.markdown("---")
@@ -173,104 +203,101 @@ def show():
             
             task_types = stats.get("task_types", {})
             if task_types:
-                df = pd.DataFrame(list(task_types.items()), columns=['Task', 'Count'])
-                df = df.sort_values('Count', ascending=True)
-                
-                fig = px.bar(df, x='Count', y='Task', orientation='h',
-                           color='Count', color_continuous_scale='Viridis')
-                fig.update_layout(
-                    showlegend=False,
-                    height=300,
-                    margin=dict(t=0, b=0, l=0, r=0)
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                # Sorted, so the same counts hit the cached figure whatever order the API listed them in
+                st.plotly_chart(task_distribution_figure(tuple(sorted(task_types.items()))), use_container_width=True)
             else:
                 st.info("No task data available yet")
             
             # Recent activity with caching history
             st.markdown("---")
             st.subheader("🕐 Recent Activity & Caching History")
-            
-            recent_requests = stats.get("recent_requests", [])
-            if recent_requests:
-                # Create DataFrame
-                df = pd.DataFrame(recent_requests)
-                
-                # Add visual indicators
-                if 'cache_source' in df.columns:
-                    df['Cache Status'] = df['cache_source'].apply(
-                        lambda x: '⚡ Memcached' if x == 'memcache' 
-                        else '💾 Redis' if x == 'redis' 
-                        else '🤖 AI Model'
-                    )
-                
-                # Display as table
-                st.dataframe(
-                    df,
-                    use_container_width=True,
-                    hide_index=True,
-                    column_config={
-                        "timestamp": st.column_config.DatetimeColumn(
-                            "Time",
-                            format="MMM DD, HH:mm:ss"
-                        ),
-                        "cache_source": st.column_config.TextColumn(
-                            "Source",
-                        ),
-                        "response_time_ms": st.column_config.NumberColumn(
-                            "Response (ms)",
-                            format="%.2f"
-                        )
-                    }
-                )
-                
-                # Show caching trend
-                if len(recent_requests) > 5:
-                    st.markdown("### 📈 Caching Trend (Last Requests)")
-                    
-                    # Create timeline chart
-                    df['Request #'] = range(len(df), 0, -1)
-                    
-                    fig = go.Figure()
-                    
-                    # Add line for response time
-                    fig.add_trace(go.Scatter(
-                        x=df['Request #'],
-                        y=df['response_time_ms'],
-                        mode='lines+markers',
-                        name='Response Time',
-                        line=dict(color='#667eea', width=3),
-                        marker=dict(
-                            size=10,
-                            color=df['cache_source'].map({
-                                'memcache': '#2ecc71',
-                                'redis': '#f39c12',
-                                'model': '#e74c3c'
-                            }),
-                            line=dict(width=2, color='white')
-                        ),
-                        text=df['Cache Status'],
-                        hovertemplate='<b>%{text}</b><br>Response: %{y:.2f}ms<extra></extra>'
-                    ))
-                    
-                    fig.update_layout(
-                        height=300,
-                        xaxis_title="Request Number (Most Recent →)",
-                        yaxis_title="Response Time (ms)",
-                        showlegend=False,
-                        margin=dict(t=20, b=20, l=20, r=20),
-                        yaxis_type="log"  # Log scale to show differences better
-                    )
-                    
-                    st.plotly_chart(fig, use_container_width=True)
-                    
-                    st.caption("🟢 Green = Memcached (2ms) | 🟠 Orange = Redis (12ms) | 🔴 Red = AI Model (1200ms)")
-            else:
-                st.info("No recent activity. Start making requests to see history!")
-        
-        else:
-            st.error(f"Failed to fetch statistics: {response.status_code}")
+            recent_activity()
     
     except requests.exceptions.RequestException as e:
         st.error(f"API Error: {str(e)}")
         st.warning("⚠️ Make sure the FastAPI server is running")
+
+@st.fragment(run_every=RECENT_ACTIVITY_REFRESH_SECONDS)
+def recent_activity():
+    """Recent requests table and trend; reruns on its own timer without rebuilding the charts above"""
+    try:
+        stats = fetch_statistics()
+    except requests.exceptions.RequestException as e:
+        st.error(f"API Error: {str(e)}")
+        return
+    
+    recent_requests = stats.get("recent_requests", [])
+    if recent_requests:
+        # Create DataFrame
+        df = pd.DataFrame.from_records(recent_requests)
+        
+        # Ship compact, typed columns to the browser: float32 times rounded to what is shown,
+        # and real datetimes for the Time column
+        if 'response_time_ms' in df.columns:
+            df['response_time_ms'] = df['response_time_ms'].astype(np.float32).round(2)
+        if 'timestamp' in df.columns:
+            df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True, cache=True)
+        
+        # Add visual indicators
+        if 'cache_source' in df.columns:
+            df['Cache Status'] = df['cache_source'].map(CACHE_STATUS_LABELS).fillna(CACHE_STATUS_DEFAULT)
+        
+        # Display as table
+        st.dataframe(
+            df,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "timestamp": st.column_config.DatetimeColumn(
+                    "Time",
+                    format="MMM DD, HH:mm:ss"
+                ),
+                "cache_source": st.column_config.TextColumn(
+                    "Source",
+                ),
+                "response_time_ms": st.column_config.NumberColumn(
+                    "Response (ms)",
+                    format="%.2f"
+                )
+            }
+        )
+        
+        # Show caching trend
+        if len(recent_requests) > 5:
+            st.markdown("### 📈 Caching Trend (Last Requests)")
+            
+            # Create timeline chart
+            df['Request #'] = np.arange(len(df), 0, -1)
+            
+            fig = go.Figure()
+            
+            # Add line for response time (WebGL, so long histories don't stall the browser's SVG renderer)
+            fig.add_trace(go.Scattergl(
+                x=df['Request #'],
+                y=df['response_time_ms'],
+                mode='lines+markers',
+                name='Response Time',
+                line=dict(color='#667eea', width=3),
+                marker=dict(
+                    size=10,
+                    color=df['cache_source'].map(MARKER_COLORS).to_numpy(),
+                    line=dict(width=2, color='white')
+                ),
+                text=df['Cache Status'],
+                hovertemplate='<b>%{text}</b><br>Response: %{y:.2f}ms<extra></extra>'
+            ))
+            
+            fig.update_layout(
+                height=300,
+                xaxis_title="Request Number (Most Recent →)",
+                yaxis_title="Response Time (ms)",
+                showlegend=False,
+                margin=dict(t=20, b=20, l=20, r=20),
+                yaxis_type="log"  # Log scale to show differences better
+            )
+            
+            st.plotly_chart(fig, use_container_width=True)
+            
+            st.caption("🟢 Green = Memcached (2ms) | 🟠 Orange = Redis (12ms) | 🔴 Red = AI Model (1200ms)")
+    else:
+        st.info("No recent activity. Start making requests to see history!")
@@ -2,12 +2,24 @@
 Text Processing Page
 """
 import streamlit as st
+import orjson
 import requests
-import json
 from datetime import datetime
 
+from ui.utils import API_TIMEOUT, error_text, http_session, parse_json, result_field
+
 API_BASE_URL = "http://127.0.0.1:8000/api/v1"
 
+# Sentiment value -> label shown in the result metric
+SENTIMENT_LABELS = {
+    "positive": "😊 Positive",
+    "negative": "😢 Negative",
+    "neutral": "😐 Neutral"
+}
+
+# Chat messages rendered per rerun; older ones stay in session state behind a toggle
+CHAT_HISTORY_SHOWN = 50
+
 def show():
     """Display text processing interface"""
     
@@ -16,19 +28,12 @@ def show():
     # Task selection
     task = st.selectbox(
         "Select Task",
-        ["Summarization", "Chat", "Sentiment Analysis", "Translation"],
+        list(TASK_VIEWS),
         help="Choose the AI task you want to perform"
     )
     
     # Task-specific inputs
-    if task == "Summarization":
-        show_summarization()
-    elif task == "Chat":
-        show_chat()
-    elif task == "Sentiment Analysis":
-        show_sentiment()
-    elif task == "Translation":
-        show_translation()
+    TASK_VIEWS[task]()
 
 def show_summarization():
     """Summarization interface"""
@@ -50,14 +55,14 @@ def show_summarization():
         
         with st.spinner("Processing..."):
             try:
-                response = requests.post(
+                response = http_session.post(
                     f"{API_BASE_URL}/text/summarize",
                     data={"text": text.strip(), "max_length": max_length},
-                    timeout=30
+                    timeout=API_TIMEOUT
                 )
                 
                 if response.status_code == 200:
-                    result = response.json()
+                    result = parse_json(response)
                     
                     # Display cache source prominently
                     cache_source = result.get("cache_source", "model")
@@ -102,11 +107,22 @@ def show_summarization():
                             st.write(f"**Summary Length**: {result['summary_length']} chars")
                             st.write(f"**Summary Words**: {result['summary_words']} words")
                 else:
-                    st.error(f"❌ Error {response.status_code}: {response.text}")
+                    st.error(f"❌ Error {response.status_code}: {error_text(response)}")
             
             except requests.exceptions.RequestException as e:
                 st.error(f"❌ API Error: {str(e)}")
 
+def stream_deltas(response, final):
+    """Yield the text deltas of a server-sent event stream; the closing event (done or error) is stored in final"""
+    for line in response.iter_lines():
+        if not line.startswith(b"data: "):
+            continue
+        event = orjson.loads(line[6:])
+        if event.get("done"):
+            final.update(event)
+            return
+        yield event["delta"]
+
 def show_chat():
     """Chat interface"""
     st.subheader("💬 AI Chat")
@@ -115,8 +131,12 @@ def show_chat():
     if "messages" not in st.session_state:
         st.session_state.messages = []
     
-    # Display chat messages
-    for message in st.session_state.messages:
+    # Display chat messages; long chats show only the latest ones unless asked for everything
+    messages = st.session_state.messages
+    if len(messages) > CHAT_HISTORY_SHOWN and not st.toggle(f"Show all {len(messages)} messages"):
+        st.caption(f"Showing the last {CHAT_HISTORY_SHOWN} messages")
+        messages = messages[-CHAT_HISTORY_SHOWN:]
+    for message in messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
             if "cache_info" in message:
@@ -129,37 +149,38 @@ def show_chat():
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Get AI response
+        # Get AI response, rendering the reply as it streams in
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                try:
-                    response = requests.post(
-                        f"{API_BASE_URL}/text/chat",
-                        data={"message": prompt},
-                        timeout=30
-                    )
-                    
+            final = {}
+            try:
+                with http_session.post(
+                    f"{API_BASE_URL}/text/chat/stream",
+                    data={"message": prompt},
+                    timeout=API_TIMEOUT,
+                    stream=True
+                ) as response:
                     if response.status_code == 200:
-                        result = response.json()
-                        ai_response = result.get("response", result.get("output", {}).get("response", "No response"))
-                        cache_source = result.get("cache_source", "model")
-                        response_time = result.get("response_time_ms", 0)
-                        
-                        st.markdown(ai_response)
-                        cache_info = f"Source: {cache_source.upper()} | Time: {response_time:.2f}ms"
-                        st.caption(f"⚡ {cache_info}")
-                        
-                        # Save assistant message
-                        st.session_state.messages.append({
-                            "role": "assistant",
-                            "content": ai_response,
-                            "cache_info": cache_info
-                        })
+                        ai_response = st.write_stream(stream_deltas(response, final))
                     else:
                         st.error(f"Error: {response.status_code}")
                 
-                except requests.exceptions.RequestException as e:
-                    st.error(f"API Error: {str(e)}")
+                if "error" in final:
+                    st.error(f"Error: {final['error']}")
+                elif final:
+                    cache_source = final.get("cache_source", "model")
+                    response_time = final.get("response_time_ms", 0)
+                    cache_info = f"Source: {cache_source.upper()} | Time: {response_time:.2f}ms"
+                    st.caption(f"⚡ {cache_info}")
+                    
+                    # Save assistant message
+                    st.session_state.messages.append({
+                        "role": "assistant",
+                        "content": ai_response,
+                        "cache_info": cache_info
+                    })
+            
+            except requests.exceptions.RequestException as e:
+                st.error(f"API Error: {str(e)}")
     
     # Clear chat button
     if st.button("🗑️ Clear Chat"):
@@ -184,28 +205,22 @@ def show_sentiment():
         
         with st.spinner("Analyzing..."):
             try:
-                response = requests.post(
+                response = http_session.post(
                     f"{API_BASE_URL}/text/sentiment",
                     data={"text": text},
-                    timeout=30
+                    timeout=API_TIMEOUT
                 )
                 
                 if response.status_code == 200:
-                    result = response.json()
-                    sentiment = result.get("sentiment", result.get("output", {}).get("sentiment", "unknown"))
-                    
-                    # Display sentiment with emoji
-                    sentiment_emoji = {
-                        "positive": "😊 Positive",
-                        "negative": "😢 Negative",
-                        "neutral": "😐 Neutral"
-                    }
+                    result = parse_json(response)
+                    sentiment = result_field(result, "sentiment", "unknown")
                     
                     st.success("✅ Analysis Complete!")
                     
                     col1, col2 = st.columns(2)
                     with col1:
-                        st.metric("Sentiment", sentiment_emoji.get(sentiment, sentiment))
+                        # Display sentiment with emoji
+                        st.metric("Sentiment", SENTIMENT_LABELS.get(sentiment, sentiment))
                     with col2:
                         response_time = result.get("response_time_ms", 0)
                         st.metric("Response Time", f"{response_time:.2f}ms")
@@ -248,14 +263,14 @@ def show_translation():
         
         with st.spinner(f"Translating to {target_language}..."):
             try:
-                response = requests.post(
+                response = http_session.post(
                     f"{API_BASE_URL}/text/translate",
                     data={"text": text, "target_language": target_language},
-                    timeout=30
+                    timeout=API_TIMEOUT
                 )
                 
                 if response.status_code == 200:
-                    result = response.json()
+                    result = parse_json(response)
                     
                     st.success("✅ Translation Complete!")
                     
@@ -267,7 +282,7 @@ def show_translation():
                     
                     with col2:
                         st.markdown(f"**Translated to {target_language}:**")
-                        st.success(result.get("translated_text", result.get("output", {}).get("translated_text", "Translation not available")))
+                        st.success(result_field(result, "translated_text", "Translation not available"))
                     
                     # Cache info
                     cache_source = result.get("cache_source", "model")
@@ -279,3 +294,11 @@ def show_translation():
             
             except requests.exceptions.RequestException as e:
                 st.error(f"API Error: {str(e)}")
+
+# Task selector options and the view rendering each one (defined after the views it refers to)
+TASK_VIEWS = {
+    "Summarization": show_summarization,
+    "Chat": show_chat,
+    "Sentiment Analysis": show_sentiment,
+    "Translation": show_translation,
+}
@@ -1,7 +1,79 @@
 """
 Utility functions for Streamlit UI
 """
+import orjson
+import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# requests rather than httpx with http2=True: the API is plain HTTP served by uvicorn, which
+# speaks HTTP/1.1 only, and httpx negotiates HTTP/2 solely over TLS, so it would not multiplex
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """Keep-alive session shared by all pages and users, retrying transient gateway errors with backoff"""
+    session = requests.Session()
+    # requests already sends Accept-Encoding: gzip, deflate, which is all the API's GZipMiddleware
+    # emits (for bodies over 1 KB); Brotli would need server support to ever be used
+    session.headers.update({"User-Agent": "ai-cache-ui/1.0", "Accept": "application/json"})
+    # read=0: a POST that timed out may still be running a model call (and writing its cache
+    # entry), so only failures before the request was sent or gateway error statuses are retried
+    retry = Retry(
+        total=3,
+        read=0,
+        backoff_factor=0.5,
+        # Not 504: a gateway timeout is a read timeout seen by a proxy, and retrying it would
+        # spend the full read budget again
+        status_forcelist=[429, 502, 503],
+        allowed_methods=["GET", "POST"]
+    )
+    # Few distinct hosts (the API plus image URLs), but many concurrent Streamlit sessions per host
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=20, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# (connect, read) timeout for model-backed API calls: an unreachable API fails in seconds
+# (and is retried by the adapter) instead of hanging for the whole read budget. Reads are
+# never retried, so a call waits at most 4 x 3s connect attempts plus ~3.5s of backoff,
+# then 27s for the response: about 43s in total, not a multiple of the read budget
+API_TIMEOUT = (3, 27)
+
+
+# Held by st.cache_resource, so the same session (and its connection pool) survives reruns
+# and module reloads (e.g. Streamlit's run-on-save), not just ordinary module caching
+http_session = get_http_session()
+
+
+def parse_json(response: requests.Response):
+    """Decode a JSON response body with orjson, skipping requests' charset detection and stdlib json"""
+    return orjson.loads(response.content)
+
+
+def result_field(result: dict, key: str, default=None):
+    """A task output field, read from the top level or else from a nested "output" object, without building fallbacks"""
+    if key in result:
+        return result[key]
+    output = result.get("output")
+    return output.get(key, default) if isinstance(output, dict) else default
+
+
+def error_text(response: requests.Response) -> str:
+    """Body of an error response for display; the API always sends UTF-8, so requests' charset detection is skipped"""
+    return response.content.decode("utf-8", errors="replace")
+
+
+# One request covers every service: the API probes Redis, Memcached and the database
+# concurrently and serves a background-refreshed snapshot, so there is nothing to fan out here
+@st.cache_data(ttl=10, show_spinner=False)
+def fetch_health(url: str) -> dict:
+    """/health JSON, reused across reruns for 10 seconds (errors are not cached); .clear() forces a re-check"""
+    response = http_session.get(url, timeout=5)
+    response.raise_for_status()
+    return parse_json(response)
+
 
 def show_cache_info(cache_source: str, response_time: float):
     """Display cache information in a formatted way"""